@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+title: async_ciphers.py
+date: 2026-10-18
+author: jskrable
+description: asyncio front end for the ciphers, runs key generation,
+encryption, decryption and cracking off the event loop
+"""
+
+import os
+import atexit
+import signal
+import asyncio
+import weakref
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import ciphers
+
+
+# operations running at once in the default pool, the rest wait their turn
+MAX_CONCURRENT = os.cpu_count() or 1
+
+
+def _crack_target(conn, func, args, kwargs):
+    """
+    crack process entry point, sends back (ok, result or exception).
+    the process leads a group of its own, so the walker pools of a
+    parallel crack can be killed along with it.
+    """
+    if hasattr(os, 'setpgid'):
+        os.setpgid(0, 0)
+    try:
+        conn.send((True, func(*args, **kwargs)))
+    except BaseException as e:
+        conn.send((False, e))
+    finally:
+        conn.close()
+
+
+def _receive(conn):
+    """
+    blocks a helper thread until the crack process answers or dies
+    """
+    try:
+        return conn.recv()
+    except EOFError:
+        return False, Exception('Crack process exited without a result.')
+    finally:
+        conn.close()
+
+
+def _kill(process):
+    """
+    terminates the crack process and every process it started
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # no process groups here, or the group is not set up yet, in
+        # which case the process has not started any workers either
+        process.terminate()
+
+
+class AsyncPool:
+    """
+    runs cpu bound cipher work off the event loop. ordinary calls go to a
+    shared process pool of workers processes. cracks, which can run for
+    hours, each get a process of their own, so a timeout or cancellation
+    kills them instead of leaving them to burn a pool worker. at most
+    limit operations run at once, later ones wait on a semaphore, which
+    gives callers backpressure instead of an unbounded backlog. a
+    semaphore only works within one event loop, so each loop using the
+    pool gets its own, and the limit holds per loop.
+    """
+
+    def __init__(self, limit=None, workers=None):
+        self.limit = limit or MAX_CONCURRENT
+        self.workers = workers or self.limit
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._executor = None
+
+
+    @property
+    def semaphore(self):
+        """
+        the semaphore of the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """
+        awaits func(*args, **kwargs) in the process pool. on timeout the
+        call is abandoned, but a call that already started runs to the
+        end in its worker, so keep long work to crack.
+        """
+        async with self.semaphore:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers)
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+            return await asyncio.wait_for(future, timeout)
+
+
+    async def crack(self, func, *args, timeout=None, **kwargs):
+        """
+        awaits func(*args, **kwargs) in a fresh process, killed with any
+        worker processes it started, a parallel crack's walkers, as soon
+        as the timeout passes or the awaiting task is cancelled. raises
+        asyncio.TimeoutError on timeout and whatever func raised.
+        """
+        async with self.semaphore:
+            ctx = multiprocessing.get_context()
+            recv, send = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_crack_target, args=(send, func, args, kwargs))
+            process.start()
+            send.close()
+            try:
+                ok, result = await asyncio.wait_for(asyncio.to_thread(_receive, recv), timeout)
+            finally:
+                if process.is_alive():
+                    _kill(process)
+                await asyncio.to_thread(process.join)
+        if not ok:
+            raise result
+        return result
+
+
+    def close(self):
+        """
+        shuts the process pool down, dropping calls that have not started
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_default_pool = None
+
+
+def default_pool():
+    """
+    the shared AsyncPool, created on first use and closed at exit
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = AsyncPool()
+        atexit.register(_default_pool.close)
+    return _default_pool
+
+
+async def crack_async(cipher, *args, timeout=None, pool=None, **kwargs):
+    """
+    awaits cipher.crack(*args, **kwargs) in a killable process, see
+    AsyncPool.crack. cipher is a plain RSA or ElGamal instance.
+    """
+    return await (pool or default_pool()).crack(cipher.crack, *args, timeout=timeout, **kwargs)
+
+
+class _AsyncCipher:
+    """
+    wraps a cipher instance, every operation is awaited through a pool.
+    public attributes such as n and e, or mod, base and key_pub, are
+    read straight from the wrapped cipher.
+    """
+
+    cipher_class = None
+
+    def __init__(self, cipher, pool=None):
+        self.cipher = cipher
+        self.pool = pool or default_pool()
+
+
+    @classmethod
+    async def create(cls, *args, pool=None, timeout=None, **kwargs):
+        """
+        generates a key in the pool, takes the arguments of the cipher
+        class
+        """
+        pool = pool or default_pool()
+        cipher = await pool.run(cls.cipher_class, *args, timeout=timeout, **kwargs)
+        return cls(cipher, pool)
+
+
+    def __getattr__(self, name):
+        return getattr(self.cipher, name)
+
+
+    async def encrypt_async(self, *args, timeout=None, **kwargs):
+        return await self.pool.run(self.cipher.encrypt, *args, timeout=timeout, **kwargs)
+
+
+    async def encrypt_many_async(self, *args, timeout=None, **kwargs):
+        return await self.pool.run(self.cipher.encrypt_many, *args, timeout=timeout, **kwargs)
+
+
+    async def decrypt_async(self, *args, timeout=None, **kwargs):
+        return await self.pool.run(self.cipher.decrypt, *args, timeout=timeout, **kwargs)
+
+
+    async def decrypt_many_async(self, *args, timeout=None, **kwargs):
+        return await self.pool.run(self.cipher.decrypt_many, *args, timeout=timeout, **kwargs)
+
+
+    async def crack_async(self, *args, timeout=None, **kwargs):
+        """
+        cracks in a killable process, see AsyncPool.crack. a
+        crack_iterations result stays in that process.
+        """
+        return await self.pool.crack(self.cipher.crack, *args, timeout=timeout, **kwargs)
+
+
+class AsyncRSA(_AsyncCipher):
+    """
+    RSA for asyncio code, await AsyncRSA.create(size) for a new key
+    """
+    cipher_class = ciphers.RSA
+
+
+class AsyncElGamal(_AsyncCipher):
+    """
+    El Gamal for asyncio code, await AsyncElGamal.create(size) for a new
+    key
+    """
+    cipher_class = ciphers.ElGamal
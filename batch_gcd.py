@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+title: batch_gcd.py
+date: 2026-10-18
+author: jskrable
+description: batch gcd scanner for RSA moduli that share a prime factor
+"""
+
+import os
+import argparse
+from itertools import islice
+from collections.abc import Iterator
+import crypt_helpers as cp
+
+
+def read_moduli(path):
+    """
+    streams moduli from a text file, one per line in decimal or 0x
+    prefixed hex. blank lines and lines starting with # are skipped.
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield int(line, 0)
+
+
+def product_tree(moduli):
+    """
+    builds a product tree over a list of moduli. returns its levels from
+    the leaves up, the last level holds the product of every modulus.
+    """
+    tree = [list(moduli)]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        tree.append([level[i] * level[i + 1] if i + 1 < len(level) else level[i]
+                     for i in range(0, len(level), 2)])
+    return tree
+
+
+def remainder_tree(z, tree):
+    """
+    pushes z down a product tree, reducing it mod the square of every
+    node on the way. returns z mod n**2 for every leaf n.
+    """
+    remainders = [z % (tree[-1][0] ** 2)]
+    for level in reversed(tree[:-1]):
+        remainders = [remainders[i // 2] % (n * n) for i, n in enumerate(level)]
+    return remainders
+
+
+def _reader(moduli):
+    """
+    a function that opens a fresh pass over moduli, a path to a file of
+    them or any iterable. a one shot iterator, such as a generator, can
+    only be read once, so it is held in memory.
+    """
+    if isinstance(moduli, (str, os.PathLike)):
+        return lambda: read_moduli(moduli)
+    if isinstance(moduli, Iterator):
+        moduli = list(moduli)
+    return lambda: iter(moduli)
+
+
+def _chunks(moduli, chunk):
+    moduli = iter(moduli)
+    while True:
+        c = list(islice(moduli, chunk))
+        if not c:
+            return
+        yield c
+
+
+def _batch_gcd(moduli, chunk=None):
+    """
+    generator of (modulus, gcd) pairs in order, see batch_gcd. with chunk
+    set, the moduli are read twice, once for the chunk products and once
+    more chunk by chunk, so only one chunk is held at a time.
+    """
+    read = _reader(moduli)
+    if chunk:
+        products = [product_tree(c)[-1][0] for c in _chunks(read(), chunk)]
+        chunks = _chunks(read(), chunk)
+    else:
+        chunks = _chunks(read(), None)
+        first = next(chunks, None)
+        if first is None:
+            return
+        products, chunks = [product_tree(first)[-1][0]], [first]
+
+    for i, c in enumerate(chunks):
+        tree = product_tree(c)
+        if i >= len(products) or tree[-1][0] != products[i]:
+            raise Exception('Moduli changed between passes. Cannot scan a source that is being written to.')
+        square = products[i] ** 2
+        z = 1
+        for p in products:
+            z = (z * p) % square
+        for n, r in zip(c, remainder_tree(z, tree)):
+            yield n, cp.gcd(r // n, n)
+
+
+def batch_gcd(moduli, chunk=None):
+    """
+    bernstein's batch gcd. for every modulus n returns the gcd of n with
+    the product of all the other moduli, in quasi linear time instead of
+    one gcd per pair. with Z the product of every modulus,
+    gcd(n, Z / n) = gcd(n, (Z mod n**2) / n).
+
+    moduli is a path to a file of them, see read_moduli, or an iterable.
+    chunk bounds memory for very large sets. the moduli are split into
+    chunks of that many and the source is read twice, first for the
+    product of each chunk, then chunk by chunk for the remainder trees,
+    so only one chunk and the chunk products are held at a time. Z mod
+    each chunk's squared product is built up from the chunk products, at
+    a cost quadratic in the number of chunks.
+    """
+    return [g for _, g in _batch_gcd(moduli, chunk)]
+
+
+def weak_moduli(moduli, chunk=None):
+    """
+    finds every modulus that shares a prime with another one in the set,
+    moduli and chunk as in batch_gcd. returns a dict of {modulus: factor}.
+    a modulus whose batch gcd is the whole modulus shares each of its
+    primes with a different modulus, and is split by pairwise gcds
+    against the other flagged moduli. exact duplicates cannot be split
+    and map to None.
+    """
+    flagged = [(n, g) for n, g in _batch_gcd(moduli, chunk) if g != 1]
+    weak = {}
+    for n, g in flagged:
+        if g == n:
+            g = next((f for m, _ in flagged if m != n
+                      for f in [cp.gcd(n, m)] if 1 < f < n), None)
+        weak[n] = g
+    return weak
+
+
+def scan(path, chunk=None):
+    """
+    runs weak_moduli over every modulus in a file, see read_moduli. with
+    chunk set the file is streamed, never held in memory whole.
+    """
+    return weak_moduli(path, chunk)
+
+
+def arg_parser():
+    """
+    function to parse arguments sent to terminal. descriptions below.
+    call [script] -h to show help.
+    """
+    parser = argparse.ArgumentParser(
+        description='batch gcd scanner for RSA moduli that share a prime factor')
+    parser.add_argument('path', type=str,
+                        help='file of moduli, one per line in decimal or 0x prefixed hex')
+    parser.add_argument('-c', '--chunk', default=None, type=int, nargs='?',
+                        help='moduli per product tree, bounds memory, default all at once')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+
+    args = arg_parser()
+    weak = scan(args.path, args.chunk)
+    print('{} weak moduli found'.format(len(weak)))
+    for n, p in weak.items():
+        if p:
+            print('{} = {} * {}'.format(n, p, n // p))
+        else:
+            print('{} is duplicated'.format(n))
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+title: benchmarks.py
+date: 2026-10-18
+author: jskrable
+description: timing benchmarks for crypt_helpers.py and ciphers.py
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import statistics
+import subprocess
+from timeit import default_timer as timer, repeat, Timer
+import ciphers
+import crypt_helpers as cp
+
+
+# seconds an import may add to a bare interpreter start
+IMPORT_BUDGET = 0.15
+# dependencies that should only load once something needs them
+HEAVY_MODULES = ('numpy', 'multiprocessing', 'concurrent.futures', 'parallel')
+
+
+def bench_fast_exp(digits=(10, 50, 150, 300, 600), number=200, runs=5, seed='fast_exp'):
+    """
+    times every fast_exp method against the built-in three argument pow
+    for operands of each size in digits, drawn from a generator seeded
+    with seed. returns a dict of the best time per call in seconds, keyed
+    by digits then method.
+    """
+    rng = random.Random(seed)
+    results = {}
+    for size in digits:
+        m = _random_digits(rng, size) | 1
+        x = rng.randrange(2, m)
+        e = _random_digits(rng, size)
+        timings = {'pow': min(repeat(lambda: pow(x, e, m), number=number, repeat=runs)) / number}
+        for method in ('auto', 'window', 'montgomery', 'binary'):
+            timings[method] = min(repeat(
+                lambda: cp.fast_exp(x, e, m, method=method),
+                number=number, repeat=runs)) / number
+        results[size] = timings
+    return results
+
+
+# fixtures are drawn from the seeded generator each setup is handed, never
+# from prime_search or blum_blum_shub, which read the operating system's
+# entropy, so every run times the same keys and operands
+
+def _random_digits(rng, digits):
+    return rng.randrange(10 ** (digits - 1), 10 ** digits)
+
+
+def _prime(rng, digits, safe=False):
+    """
+    the first prime of digits digits above a seeded start, or with safe
+    set the safe prime 2q + 1 for the first such q
+    """
+    while True:
+        start = _random_digits(rng, digits) | 1
+        width = min(8 * start.bit_length() + 16, (10 ** digits - start + 1) // 2)
+        for c in cp.sieve_candidates(start, width, safe):
+            if cp.miller_rabin(c) and (not safe or cp.miller_rabin(2 * c + 1)):
+                return 2 * c + 1 if safe else c
+
+
+def _rsa(rng, digits):
+    p = _prime(rng, digits)
+    q = _prime(rng, digits)
+    while q == p:
+        q = _prime(rng, digits)
+    phi = (p - 1) * (q - 1)
+    e = _random_digits(rng, digits)
+    while cp.gcd(phi, e) != 1:
+        e = _random_digits(rng, digits)
+    return ciphers.RSA(p=p, q=q, e=e)
+
+
+def _elgamal(rng, digits, safe=False):
+    mod = _prime(rng, digits, safe)
+    # a safe prime 2q + 1 needs no factoring to find a generator
+    base = cp.primitive_root_search(mod, {2, (mod - 1) // 2} if safe else None)
+    return ciphers.ElGamal(params=ciphers.DomainParameters(mod=mod, base=base))
+
+
+def _elgamal_message(rng, elgamal, key=None):
+    """
+    a seeded message encrypted to key, the instance's own by default, as
+    (c1, c2)
+    """
+    mod, base = elgamal.mod, elgamal.base
+    k = rng.randrange(2, mod - 1)
+    s = cp.fast_exp(key or elgamal.key_pub, k, mod)
+    return cp.fast_exp(base, k, mod), (s * rng.randrange(2, mod)) % mod
+
+
+def _fast_exp(digits, rng):
+    m = _random_digits(rng, digits) | 1
+    x, e = rng.randrange(2, m), _random_digits(rng, digits)
+    return lambda: cp.fast_exp(x, e, m)
+
+
+def _miller_rabin(digits, rng):
+    # a prime runs every round, the worst case
+    p = _prime(rng, digits)
+    return lambda: cp.miller_rabin(p)
+
+
+def _gcd(digits, rng):
+    m, n = _random_digits(rng, digits), _random_digits(rng, digits)
+    return lambda: cp.gcd(m, n)
+
+
+def _ext_gcd(digits, rng):
+    m, n = _random_digits(rng, digits), _random_digits(rng, digits)
+    return lambda: cp.ext_gcd(m, n)
+
+
+def _rsa_encrypt(digits, rng):
+    rsa = _rsa(rng, digits)
+    message = rng.randrange(2, rsa.n)
+    return lambda: rsa.encrypt(message)
+
+
+def _rsa_decrypt(digits, rng):
+    rsa = _rsa(rng, digits)
+    c = rsa.encrypt(rng.randrange(2, rsa.n))
+    return lambda: rsa.decrypt(c)
+
+
+def _rsa_crack(digits, rng):
+    rsa = _rsa(rng, digits)
+    c = rsa.encrypt(rng.randrange(2, rsa.n))
+    return lambda: rsa.crack(c)
+
+
+def _elgamal_encrypt(digits, rng):
+    # a safe prime, so the setup never has to factor a large p - 1
+    elgamal = _elgamal(rng, digits, safe=True)
+    message = rng.randrange(2, elgamal.mod)
+    return lambda: elgamal.encrypt(message)
+
+
+def _elgamal_decrypt(digits, rng):
+    elgamal = _elgamal(rng, digits, safe=True)
+    c1, c2 = _elgamal_message(rng, elgamal)
+    return lambda: elgamal.decrypt(c1, c2)
+
+
+def _elgamal_crack(digits, rng):
+    elgamal = _elgamal(rng, digits)
+    # the key to crack is seeded too, the instance's own is drawn at random
+    key = cp.fast_exp(elgamal.base, rng.randrange(2, elgamal.mod - 1), elgamal.mod)
+    c1, c2 = _elgamal_message(rng, elgamal, key)
+    return lambda: elgamal.crack(c1, c2, key=key)
+
+
+# name: (setup, default sizes in digits). setup takes a size and a seeded
+# random.Random and returns the zero argument call to time, everything it
+# builds is left untimed. key generation draws from the operating system
+# by design, so those benchmarks time fresh keys and rely on enough calls
+# to even out. cracking is exponential in the size, so its sizes stay small.
+BENCHMARKS = {
+    'fast_exp': (_fast_exp, (10, 50, 150, 300)),
+    'miller_rabin': (_miller_rabin, (10, 50, 150, 300)),
+    'prime_search': (lambda d, rng: lambda: cp.prime_search(d, True), (10, 50, 150)),
+    'blum_blum_shub': (lambda d, rng: lambda: cp.blum_blum_shub(d), (10, 50, 150)),
+    'naor_reingold': (lambda d, rng: lambda: cp.naor_reingold(d), (10, 50, 150)),
+    'gcd': (_gcd, (10, 50, 150, 300)),
+    'ext_gcd': (_ext_gcd, (10, 50, 150, 300)),
+    'rsa_keygen': (lambda d, rng: lambda: ciphers.RSA(d), (10, 50, 150)),
+    'rsa_encrypt': (_rsa_encrypt, (10, 50, 150)),
+    'rsa_decrypt': (_rsa_decrypt, (10, 50, 150)),
+    'rsa_crack': (_rsa_crack, (6, 8, 10)),
+    'elgamal_keygen': (lambda d, rng: lambda: ciphers.ElGamal(d), (10, 20)),
+    'elgamal_safe_keygen': (lambda d, rng: lambda: ciphers.ElGamal(d, safe=True), (10, 50)),
+    'elgamal_encrypt': (_elgamal_encrypt, (10, 50, 150)),
+    'elgamal_decrypt': (_elgamal_decrypt, (10, 50, 150)),
+    'elgamal_crack': (_elgamal_crack, (6, 8, 10)),
+}
+
+
+def measure(func, runs=5, number=None, warmup=1):
+    """
+    times func, runs timing runs of number calls each after warmup
+    untimed calls. with no number, enough calls to fill about 0.2
+    seconds are found first, which doubles as extra warmup. returns
+    statistics of the seconds per call over the runs.
+    """
+    for _ in range(warmup):
+        func()
+    timer_ = Timer(func)
+    number = number or timer_.autorange()[0]
+    times = [t / number for t in timer_.repeat(repeat=runs, number=number)]
+    return {
+        'runs': runs,
+        'number': number,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if runs > 1 else 0.0,
+        'max': max(times),
+    }
+
+
+def run_suite(names=None, digits=None, runs=5, number=None, warmup=1):
+    """
+    runs the named benchmarks, every one by default, at each size in
+    digits or the benchmark's own default sizes. returns a dict with
+    'meta', describing the machine, and 'results' of measure statistics
+    keyed by benchmark name then size as a string, as stored in json.
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        setup, sizes = BENCHMARKS[name]
+        results[name] = {}
+        for size in digits or sizes:
+            # a generator of its own per benchmark and size, seeded the same
+            # every run, so runs compare like for like
+            rng = random.Random('{}-{}'.format(name, size))
+            results[name][str(size)] = measure(setup(size, rng), runs, number, warmup)
+    meta = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+    return {'meta': meta, 'results': results}
+
+
+def save(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(report, baseline, threshold=1.25):
+    """
+    compares median times against a baseline report, benchmarks and
+    sizes missing from either side are skipped. returns a list of
+    (name, size, ratio, regressed) where ratio is current over baseline
+    and regressed is set when it exceeds threshold.
+    """
+    rows = []
+    for name, sizes in report['results'].items():
+        for size, stats in sizes.items():
+            base = baseline['results'].get(name, {}).get(size)
+            if base:
+                ratio = stats['median'] / base['median']
+                rows.append((name, size, ratio, ratio > threshold))
+    return rows
+
+
+def _interpreter(code):
+    """
+    runs code in a fresh interpreter from this directory, returns
+    (seconds, output)
+    """
+    start = timer()
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return timer() - start, out
+
+
+def bench_import(modules=('crypt_helpers', 'ciphers'), runs=5):
+    """
+    times importing each module in a fresh interpreter, less the best
+    time of an interpreter that imports nothing. returns a dict keyed by
+    module of (best seconds, list of HEAVY_MODULES the import loaded).
+    """
+    probe = 'import sys; print(" ".join(m for m in {!r} if m in sys.modules))'.format(HEAVY_MODULES)
+    bare = min(_interpreter(probe)[0] for _ in range(runs))
+    results = {}
+    for module in modules:
+        timings = [_interpreter('import {}; {}'.format(module, probe)) for _ in range(runs)]
+        results[module] = (max(0.0, min(t for t, _ in timings) - bare), timings[0][1].split())
+    return results
+
+
+def arg_parser():
+    """
+    function to parse arguments sent to terminal. descriptions below.
+    call [script] -h to show help.
+    """
+    parser = argparse.ArgumentParser(
+        description='timing benchmarks for crypt_helpers.py and ciphers.py')
+    parser.add_argument('-b', '--bench', default=None, type=str, nargs='*', choices=list(BENCHMARKS),
+                        help='benchmarks to run, default all')
+    parser.add_argument('-d', '--digits', default=None, type=int, nargs='*',
+                        help='sizes in digits to run every benchmark at, default per benchmark')
+    parser.add_argument('-r', '--runs', default=5, type=int, nargs='?',
+                        help='timing runs per benchmark and size, default 5')
+    parser.add_argument('-n', '--number', default=None, type=int, nargs='?',
+                        help='calls per timing run, default enough for about 0.2 seconds')
+    parser.add_argument('-w', '--warmup', default=1, type=int, nargs='?',
+                        help='untimed calls before timing, default 1')
+    parser.add_argument('-o', '--output', default=None, type=str, nargs='?',
+                        help='json file to store the results in')
+    parser.add_argument('-c', '--compare', default=None, type=str, nargs='?',
+                        help='baseline json file to compare against, exits 1 on regressions')
+    parser.add_argument('-t', '--threshold', default=1.25, type=float, nargs='?',
+                        help='slowdown over the baseline median flagged as a regression, default 1.25')
+    parser.add_argument('-m', '--methods', default=False, type=bool, nargs='?', const=True,
+                        help='also compare every fast_exp method against pow, default False')
+    parser.add_argument('-i', '--imports', default=['crypt_helpers', 'ciphers'], type=str, nargs='*',
+                        help='modules to time the import of, default crypt_helpers ciphers')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+
+    args = arg_parser()
+    report = run_suite(args.bench, args.digits, args.runs, args.number, args.warmup)
+    print('\nmicroseconds per call')
+    print('\n----------------------------------------------------------------------\n')
+    print('{:>20}{:>8}{:>12}{:>12}{:>12}{:>10}'.format(
+        'benchmark', 'digits', 'min', 'median', 'mean', 'stdev %'))
+    for name, sizes in report['results'].items():
+        for size, stats in sizes.items():
+            print('{:>20}{:>8}{:>12.2f}{:>12.2f}{:>12.2f}{:>10.1f}'.format(
+                name, size, stats['min'] * 1e6, stats['median'] * 1e6, stats['mean'] * 1e6,
+                100 * stats['stdev'] / stats['mean']))
+    if args.output:
+        save(report, args.output)
+        print('\nresults saved to {}'.format(args.output))
+
+    regressions = []
+    if args.compare:
+        print('\nmedian against {}, regression over {:.2f}x'.format(args.compare, args.threshold))
+        print('\n----------------------------------------------------------------------\n')
+        for name, size, ratio, regressed in compare(report, load(args.compare), args.threshold):
+            print('{:>20}{:>8}{:>10.2f}x  {}'.format(name, size, ratio, 'REGRESSION' if regressed else ''))
+            if regressed:
+                regressions.append((name, size))
+
+    if args.methods:
+        results = bench_fast_exp(args.digits or (10, 50, 150, 300, 600))
+        print('\nfast_exp, best microseconds per call')
+        print('\n----------------------------------------------------------------------\n')
+        methods = list(next(iter(results.values())))
+        print('{:>8}'.format('digits') + ''.join('{:>12}'.format(m) for m in methods) + '{:>12}'.format('auto/pow'))
+        for size, timings in results.items():
+            print('{:>8}'.format(size)
+                  + ''.join('{:>12.2f}'.format(timings[m] * 1e6) for m in methods)
+                  + '{:>12.2f}'.format(timings['auto'] / timings['pow']))
+
+    print('\nimport time in a fresh interpreter, budget {:.0f} ms'.format(IMPORT_BUDGET * 1e3))
+    print('\n----------------------------------------------------------------------\n')
+    for module, (seconds, heavy) in bench_import(args.imports).items():
+        print('{:>16}{:>10.1f} ms  {:<6}{}'.format(
+            module, seconds * 1e3, 'ok' if seconds <= IMPORT_BUDGET else 'OVER',
+            'loads ' + ', '.join(heavy) if heavy else ''))
+
+    if regressions:
+        sys.exit(1)
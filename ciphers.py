@@ -8,29 +8,96 @@ description: cipher classes for RSA and El Gamal
 """
 
 import math
+from collections import deque
+from functools import partial
+import instrument
 import crypt_helpers as cp
 from timeit import default_timer as timer
 
+def _private_key(p, q, e):
+    """
+    derives the RSA private exponent d from the primes p and q, along with
+    the chinese remainder theorem exponents dp and dq and the coefficient
+    q_inv = q**-1 mod p. returns the tuple (d, dp, dq, q_inv).
+    """
+    phi = (p - 1) * (q - 1)
+    d = cp.mod_inverse(e, phi)
+    q_inv = cp.mod_inverse(q, p)
+    return d, d % (p - 1), d % (q - 1), q_inv
+
+
+def _generate_primes(size):
+    """
+    two distinct primes of size digits for an RSA modulus
+    """
+    p = cp.prime_search(size, True)
+    q = cp.prime_search(size, True)
+    while q == p:
+        q = cp.prime_search(size, True)
+    if not (cp.miller_rabin(p) and cp.miller_rabin(q)):
+        raise Exception('P or Q is not prime. Cannot safely encrypt. Please try again.')
+    return p, q
+
+
+def _generate_exponent(phi, size):
+    """
+    a random public exponent of up to size digits coprime to phi
+    """
+    e = cp.blum_blum_shub(size)
+    while cp.gcd(phi, e) != 1:
+        e = cp.blum_blum_shub(size)
+    return e
+
+
+def _crt_decrypt(message, p, q, dp, dq, q_inv):
+    """
+    decrypts with two half size exponentiations, one mod p and one mod q,
+    then recombines the results into a residue mod p * q with garner's
+    formula.
+    """
+    m1 = cp.fast_exp(message, dp, p)
+    m2 = cp.fast_exp(message, dq, q)
+    h = (q_inv * (m1 - m2)) % p
+    return m2 + h * q
+
+
 class RSA:
 
-    def __init__(self, size=10, n=None, e=None):
-        self.__p = cp.prime_search(size, True)
-        self.__q = cp.prime_search(size, True)
-        if not (cp.miller_rabin(self.__p) or cp.miller_rabin(self.q)):
-            raise Exception('P or Q is not prime. Cannot safely encrypt. Please try again.')
-            return -1
+    def __init__(self, size=10, n=None, e=None, p=None, q=None):
+        """
+        generates a key pair of two size digit primes. pass p and q, and
+        e, to load an existing key pair instead, such as one issued by
+        key_pool.KeyPool, skipping the generation.
+        """
+        with instrument.phase('rsa_primes'):
+            if p and q:
+                self.__p, self.__q = p, q
+            else:
+                self.__p, self.__q = _generate_primes(size)
         self.__phi = ((self.__p - 1) * (self.__q - 1))
         if not n:
             self.n = self.__p * self.__q
         else:
             self.n = n
-        if not e:
-            e = cp.blum_blum_shub(size)
-            while cp.gcd(self.__phi, e) != 1:
-                e = cp.blum_blum_shub(size)
-            self.e = e
-        else: 
-            self.e = e
+        with instrument.phase('rsa_exponent'):
+            if not e:
+                self.e = _generate_exponent(self.__phi, size)
+            else: 
+                self.e = e
+        # private key material is derived once here and reused by decrypt,
+        # but only for the instance's own key. an external n or an e that
+        # is not invertible leaves an encrypt only instance.
+        self.__d = self.__dp = self.__dq = self.__q_inv = None
+        if self.n == self.__p * self.__q and cp.gcd(self.e, self.__phi) == 1:
+            with instrument.phase('rsa_private_key'):
+                self.__d, self.__dp, self.__dq, self.__q_inv = _private_key(
+                    self.__p, self.__q, self.e)
+
+
+    def __private_key(self):
+        if self.__d is None:
+            raise Exception('No private key for this modulus and exponent. Cannot decrypt, use crack for an external key.')
+        return self.__p, self.__q, self.__dp, self.__dq, self.__q_inv
 
 
     def encrypt(self, message, n=None, e=None):
@@ -40,45 +107,106 @@ class RSA:
         in modular group and returns the encrypted message.
 
         Can accept an external key as a tuple of (e, n), otherwise uses
-        the key creted at initialization.
+        the key creted at initialization. A str message is packed into an
+        int with str_to_int, decrypt with decode=True to get it back. For
+        messages larger than the modulus see codec.encrypt_stream.
         """
-        # if type(message) is str:
-        #     message = cp.str_to_int(message)
+        if type(message) is str:
+            message = cp.str_to_int(message)
         e = self.e if not e else e
         n = self.n if not n else n
         if message > n:
             raise Exception('Message larger than modular group. Cannot safely encrypt. Please provide larger size at class initialization.')
             return -1, -1
-        return cp.fast_exp(message, self.e, self.n)
+        return cp.fast_exp(message, e, n)
+
+
+    def encrypt_many(self, messages, n=None, e=None, workers=None, chunksize=None):
+        """
+        encrypts every message in an iterable or array under one public
+        key, returning a list of ciphertexts in the same order. accepts an
+        external key in the same way as encrypt.
+
+        set workers to spread the batch over a pool of processes, in
+        chunks of chunksize messages.
+        """
+        e = self.e if not e else e
+        n = self.n if not n else n
+        if workers:
+            import parallel
+            return parallel.map_chunks(partial(self.encrypt_many, n=n, e=e), messages,
+                                       workers=workers, chunksize=chunksize)
+        fast_exp = cp.fast_exp
+        encrypted = []
+        for message in messages:
+            message = int(message)
+            if message > n:
+                raise Exception('Message larger than modular group. Cannot safely encrypt. Please provide larger size at class initialization.')
+            encrypted.append(fast_exp(message, e, n))
+        return encrypted
 
 
     def decrypt(self, message, decode=False):
         """
         function to decrypt a message encrypted using RSA, given a public
-        key made up of a modulus and an exponent. calculates the decryption
-        exponent using the extended euclidean algorithm and exponentiates 
-        to solve the decryption.
-        """
-        d = self.__phi + cp.ext_gcd(self.__phi, self.e)[-1]
-        decrypted = cp.fast_exp(message, d, self.n)
-        # if decode:
-        #     decrypted = cp.int_to_str(decrypted)
+        key made up of a modulus and an exponent. uses the decryption
+        exponents cached at initialization and the chinese remainder 
+        theorem to solve the decryption with two half size exponentiations.
+        """
+        decrypted = _crt_decrypt(message, *self.__private_key())
+        if decode:
+            decrypted = cp.int_to_str(decrypted)
+        return decrypted
+
+
+    def decrypt_many(self, messages, workers=None, chunksize=None):
+        """
+        decrypts every ciphertext in an iterable or array, returning a list
+        of messages in the same order.
+
+        set workers to spread the batch over a pool of processes, in
+        chunks of chunksize messages.
+        """
+        if workers:
+            import parallel
+            return parallel.map_chunks(self.decrypt_many, messages,
+                                       workers=workers, chunksize=chunksize)
+        p, q, dp, dq, q_inv = self.__private_key()
+        fast_exp = cp.fast_exp
+        decrypted = []
+        for message in messages:
+            message = int(message)
+            m1 = fast_exp(message, dp, p)
+            m2 = fast_exp(message, dq, q)
+            decrypted.append(m2 + ((q_inv * (m1 - m2)) % p) * q)
         return decrypted
 
 
-    def crack(self, message, n=None, e=None):
+    def crack(self, message, n=None, e=None, workers=None, p=None):
         """
-        function to crack RSA encryption using pollard's rho??
-        get p and q by factoring n, calculate phi using that, get 
-        d using that.
+        function to crack RSA encryption by factoring n with find_factor,
+        pollard's rho with a lenstra ecm fallback. get p and q, derive the
+        private key material from them, and decrypt through the same CRT
+        path as decrypt.
+
+        set workers to run that many independent rho walks in parallel
+        processes instead, the steps each one took are kept in
+        crack_iterations.
+
+        a factor of n already known, for example one recovered by
+        batch_gcd.weak_moduli, can be passed as p to skip the factoring.
         """
         n = self.n if not n else n
         e = self.e if not e else e
-        p = cp.pollards_rho(n)
+        with instrument.phase('rsa_factor'):
+            if not p and workers:
+                import parallel
+                p, self.crack_iterations = parallel.parallel_factor(n, workers)
+            elif not p:
+                p = cp.find_factor(n)
         q = n // p
-        phi = (p-1) * (q-1)
-        d = phi + cp.ext_gcd(phi, e)[-1]
-        return cp.fast_exp(message, d, n)
+        d, dp, dq, q_inv = _private_key(p, q, e)
+        return _crt_decrypt(message, p, q, dp, dq, q_inv)
 
 
     def test(self, message):
@@ -99,16 +227,116 @@ class RSA:
         print('Crack time : {} seconds'.format(t2-t1))
 
 
-class ElGamal:
+def _ephemeral_keys(mod, base, key, count):
+    """
+    count fresh el gamal ephemeral keys for the recipient key, as (c1, s)
+    pairs, c1 = base**k and s = key**k for a random k. both powers go
+    through fixed base tables built once for the whole batch.
+    """
+    bits = mod.bit_length()
+    base_table = cp.fixed_base_table(base, mod, bits)
+    key_table = cp.fixed_base_table(key, mod, bits)
+    pairs = []
+    for _ in range(count):
+        k = cp.blum_blum_shub(20) % mod
+        pairs.append((cp.fixed_base_exp(base_table, k, mod), cp.fixed_base_exp(key_table, k, mod)))
+    return pairs
 
-    def __init__(self, size=10, mod=None, base=None, key=None):
-        self.mod = cp.prime_search(size, True) if not mod else mod
+
+def _ephemeral_chunk(mod, base, key, chunk):
+    """
+    worker side _ephemeral_keys, one pair per item of chunk
+    """
+    return _ephemeral_keys(mod, base, key, len(chunk))
+
+
+class DomainParameters:
+    """
+    an el gamal group, a prime mod and a generator base of it, shared by
+    any number of key pairs. finding them is the slow part of making a
+    key, so one group can serve many ElGamal instances through their
+    params argument. pass mod and base to wrap a known group.
+    """
+
+    def __init__(self, size=10, mod=None, base=None, safe=False):
+        with instrument.phase('elgamal_modulus'):
+            self.mod = cp.prime_search(size, True, safe) if not mod else mod
         # if not cp.miller_rabin(self.mod, 30):
         #     raise Exception('Modulus is not prime. Cannot safely encrypt.')
         #     return -1
-        self.base = cp.primitive_root_search(self.mod) if not base else base
+        # a safe prime 2q + 1 needs no factoring to find a generator
+        factors = {2, (self.mod - 1) // 2} if safe and not mod else None
+        with instrument.phase('elgamal_base'):
+            self.base = cp.primitive_root_search(self.mod, factors) if not base else base
+
+
+    def key(self):
+        """
+        a new ElGamal key pair in this group
+        """
+        return ElGamal(params=self)
+
+
+class ElGamal:
+
+    def __init__(self, size=10, mod=None, base=None, key=None, safe=False, params=None):
+        """
+        generates a group and a key pair in it. params, a DomainParameters,
+        or mod and base reuse an existing group instead.
+        """
+        params = params or DomainParameters(size, mod, base, safe)
+        self.mod, self.base = params.mod, params.base
         self.__key_A = cp.blum_blum_shub(20) % self.mod
         self.key_pub = cp.fast_exp(self.base, self.__key_A, self.mod) if not key else key
+        # precomputed ephemeral keys per recipient, see precompute
+        self.__ephemeral = {}
+
+
+    def __getstate__(self):
+        # a copy sent to a worker process must not take the precomputed
+        # ephemeral keys with it, its pops would never drain this queue
+        # and every message it encrypts would reuse the same k
+        state = self.__dict__.copy()
+        state['_ElGamal__ephemeral'] = {}
+        return state
+
+
+    @property
+    def params(self):
+        return DomainParameters(mod=self.mod, base=self.base)
+
+
+    def precompute(self, count, mod=None, base=None, key=None, workers=None, chunksize=None):
+        """
+        offline half of encryption. queues count ephemeral keys for the
+        recipient, mod, base and key as in encrypt, each a (c1, s) pair
+        of base**k and key**k for a fresh random k, which is not kept.
+        encrypt takes one off the queue, leaving a single modular
+        multiplication online. set workers to generate them over a pool
+        of processes. returns the number queued for the recipient.
+        """
+        mod = self.mod if not mod else mod
+        base = self.base if not base else base
+        key = self.key_pub if not key else key
+        if workers:
+            import parallel
+            pairs = parallel.map_chunks(partial(_ephemeral_chunk, mod, base, key), range(count),
+                                        workers=workers, chunksize=chunksize)
+        else:
+            pairs = _ephemeral_keys(mod, base, key, count)
+        queue = self.__ephemeral.setdefault((mod, base, key), deque())
+        queue.extend(pairs)
+        return len(queue)
+
+
+    def precomputed(self, mod=None, base=None, key=None):
+        """
+        number of ephemeral keys queued for the recipient
+        """
+        mod = self.mod if not mod else mod
+        base = self.base if not base else base
+        key = self.key_pub if not key else key
+        return len(self.__ephemeral.get((mod, base, key), ()))
 
 
     def encrypt(self, message, mod=None, base=None, key=None):
@@ -119,22 +347,65 @@ class ElGamal:
         message, c2.
 
         Accepts an external key. Requires mod, base, and key. If not provided, uses
-        the mod, base, and key created at initialization.
+        the mod, base, and key created at initialization. str messages and
+        longer ones are handled as in RSA.encrypt. Uses an ephemeral key
+        queued by precompute for the recipient while any are left.
         """
-        # if type(message) is str:
-        #     message = cp.str_to_int(message)
+        if type(message) is str:
+            message = cp.str_to_int(message)
         mod = self.mod if not mod else mod
         base = self.base if not base else base
         key = self.key_pub if not key else key
         if message > mod:
             raise Exception('Message larger than modular group. Cannot safely encrypt. Please provide larger size at class initialization.')
             return -1, -1
+        queue = self.__ephemeral.get((mod, base, key))
+        if queue:
+            # precomputed, a single modular multiplication
+            try:
+                c1, s = queue.popleft()
+                return c1, (s * message) % mod
+            except IndexError:
+                pass
         key_B = cp.blum_blum_shub(20) % mod
         c1 = cp.fast_exp(base, key_B, mod)
         c2 = (cp.fast_exp(key, key_B, mod) * message) % mod
         return c1, c2
 
 
+    def encrypt_many(self, messages, mod=None, base=None, key=None, workers=None, chunksize=None):
+        """
+        encrypts every message in an iterable or array under one public key,
+        returning a list of c1 keys and a list of c2 messages in the same
+        order. every message shares the same base and public key, so both
+        are precomputed into fixed base tables once and each encryption
+        costs a handful of multiplications instead of two exponentiations.
+
+        set workers to spread the batch over a pool of processes, in
+        chunks of chunksize messages.
+        """
+        mod = self.mod if not mod else mod
+        base = self.base if not base else base
+        key = self.key_pub if not key else key
+        if workers:
+            import parallel
+            return parallel.map_chunks(partial(self.encrypt_many, mod=mod, base=base, key=key),
+                                       messages, workers=workers, chunksize=chunksize)
+        bits = mod.bit_length()
+        base_table = cp.fixed_base_table(base, mod, bits)
+        key_table = cp.fixed_base_table(key, mod, bits)
+        fixed_base_exp = cp.fixed_base_exp
+        c1s, c2s = [], []
+        for message in messages:
+            message = int(message)
+            if message > mod:
+                raise Exception('Message larger than modular group. Cannot safely encrypt. Please provide larger size at class initialization.')
+            key_B = cp.blum_blum_shub(20) % mod
+            c1s.append(fixed_base_exp(base_table, key_B, mod))
+            c2s.append((fixed_base_exp(key_table, key_B, mod) * message) % mod)
+        return c1s, c2s
+
+
     def decrypt(self, key, message, decode=False):
         """
         function to decrypt a message encrypted using el gamal, given the
@@ -142,15 +413,35 @@ class ElGamal:
         and the previously known key_A that Alice chose during initialization.
         """
         s = cp.fast_exp(key, self.__key_A, self.mod)
-        decrypted = (cp.fast_exp(s, self.mod-2, self.mod) * message) % self.mod
-        # if decode:
-        #     decrypted = cp.int_to_str(decrypted)
+        decrypted = (cp.mod_inverse(s, self.mod) * message) % self.mod
+        if decode:
+            decrypted = cp.int_to_str(decrypted)
         return decrypted
 
 
-    def crack(self, c1, c2, mod=None, base=None, key=None):
+    def decrypt_many(self, keys, messages, workers=None, chunksize=None):
+        """
+        decrypts parallel sequences of c1 keys and c2 messages, as returned
+        by encrypt_many, returning a list of messages in the same order.
+        all shared secrets are inverted together with a single modular
+        inversion.
+
+        set workers to spread the batch over a pool of processes, in
+        chunks of chunksize messages.
         """
-        function to crack el gamal encryption using baby step giant step. takes in
+        if workers:
+            import parallel
+            return parallel.map_chunks(self.decrypt_many, keys, messages,
+                                       workers=workers, chunksize=chunksize)
+        mod, key_A = self.mod, self.__key_A
+        shared = [cp.fast_exp(int(key), key_A, mod) for key in keys]
+        inverses = cp.batch_inverse(shared, mod)
+        return [(s_inv * int(message)) % mod for s_inv, message in zip(inverses, messages)]
+
+
+    def crack(self, c1, c2, mod=None, base=None, key=None, method='auto', workers=None):
+        """
+        function to crack el gamal encryption by solving a discrete log. takes in
         the following publically transmitted information:
         c1: the base taken to key_B power
         c2: the encrypted message
@@ -158,8 +449,16 @@ class ElGamal:
         base: transmitted by Alice to begin the protocol
         mod: the mutually agreed upon modular group, public knowledge
 
-        uses baby step giant step to solve for Alice and Bob's keys, then decrypts
-        the message using the same method as Alice.
+        solves for Alice's key with crypt_helpers.discrete_log, then decrypts
+        the message using the same method as Alice. by default the strategy is
+        picked from the factorization of mod - 1: pohlig hellman down to its
+        prime subgroups, each solved by baby step giant step or, when its table
+        would not fit in memory, pollard's rho. method overrides the choice,
+        see discrete_log.
+
+        set workers to share every large pollard's rho subproblem between that
+        many processes through distinguished points, the steps each one took
+        are kept in crack_iterations.
 
         note key_A is derived here by solving a discrete log, not using the class's 
         private key_A attribute Alice saved earlier.
@@ -168,12 +467,20 @@ class ElGamal:
         base = self.base if not base else base
         key = self.key_pub if not key else key
         # get Alice's private key by solving discrete log problem
-        # runtime increases exponentially with larger keys
-        key_A = cp.baby_step_giant_step(self.key_pub, self.base, self.mod)
+        # runtime grows with the largest prime factor of mod - 1
+        with instrument.phase('elgamal_discrete_log'):
+            if workers:
+                import parallel
+                key_A, self.crack_iterations = parallel.parallel_discrete_log(
+                    key, base, mod, workers=workers, method=method)
+            else:
+                key_A = cp.discrete_log(key, base, mod, method=method)
+        if key_A is None:
+            raise Exception('Discrete log not found. Key is not a power of base mod the modulus, or the search gave up. Cannot crack.')
         # solve for the decryption key with the cracked private key
-        s = cp.fast_exp(c1, key_A, self.mod)
+        s = cp.fast_exp(c1, key_A, mod)
         # decrypt the message
-        decrypted = (cp.fast_exp(s, self.mod-2, self.mod) * c2) % self.mod
+        decrypted = (cp.mod_inverse(s, mod) * c2) % mod
         return decrypted
 
 
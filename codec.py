@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+title: codec.py
+date: 2026-10-18
+author: jskrable
+description: streaming codec, splits arbitrary bytes into blocks that fit
+under a modulus and pipes them through RSA or El Gamal lazily
+"""
+
+from functools import partial
+from itertools import islice
+import ciphers
+import crypt_helpers as cp
+
+
+def block_size(modulus):
+    """
+    payload bytes per block under modulus. every block is framed by
+    str_to_int's 0x01 marker byte, which also records its length, so a
+    block of this many bytes is always below the modulus.
+    """
+    size = (modulus.bit_length() - 1) // 8 - 1
+    if size < 1:
+        raise Exception('Modulus too small to carry a byte per block. Please provide larger size at class initialization.')
+    return size
+
+
+def chunks(source, size):
+    """
+    splits source into blocks of size bytes, the last one possibly
+    shorter. source is bytes, a str (utf-8 encoded), a binary file like
+    object with read, or any iterable of bytes pieces such as a generator.
+    only one block plus one incoming piece is held at a time.
+    """
+    if isinstance(source, str):
+        source = source.encode()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = memoryview(source)
+        for start in range(0, len(source), size):
+            yield bytes(source[start:start + size])
+        return
+    if hasattr(source, 'read'):
+        source = iter(partial(source.read, size), b'')
+    buffer = bytearray()
+    for piece in source:
+        buffer += piece
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def encode_blocks(source, modulus):
+    """
+    generator of block integers below modulus, see chunks
+    """
+    for block in chunks(source, block_size(modulus)):
+        yield cp.str_to_int(block)
+
+
+def decode_blocks(blocks):
+    """
+    generator of the bytes carried by each block integer
+    """
+    for block in blocks:
+        yield cp.int_to_str(block, None)
+
+
+def _batches(iterable, batch):
+    iterable = iter(iterable)
+    while True:
+        items = list(islice(iterable, batch))
+        if not items:
+            return
+        yield items
+
+
+def encrypt_stream(cipher, source, batch=256, workers=None, **key):
+    """
+    encrypts source, anything chunks accepts, block by block with an RSA
+    or ElGamal instance. yields ciphertexts for RSA and (c1, c2) pairs for
+    El Gamal, in order. blocks go through encrypt_many batch at a time, so
+    memory is bounded by the batch whatever the size of source. key takes
+    the external key arguments of the cipher's encrypt, n and e for RSA,
+    mod, base and key for El Gamal. set workers to spread every batch
+    over a pool of processes.
+    """
+    elgamal = isinstance(cipher, ciphers.ElGamal)
+    modulus = (key.get('mod') or cipher.mod) if elgamal else (key.get('n') or cipher.n)
+    for blocks in _batches(encode_blocks(source, modulus), batch):
+        if elgamal:
+            yield from zip(*cipher.encrypt_many(blocks, workers=workers, **key))
+        else:
+            yield from cipher.encrypt_many(blocks, workers=workers, **key)
+
+
+def decrypt_stream(cipher, ciphertexts, batch=256, workers=None):
+    """
+    inverse of encrypt_stream, takes any iterable of its output and
+    yields the decrypted bytes block by block, batch blocks at a time,
+    over workers processes when set
+    """
+    elgamal = isinstance(cipher, ciphers.ElGamal)
+    for items in _batches(ciphertexts, batch):
+        if elgamal:
+            blocks = cipher.decrypt_many(*zip(*items), workers=workers)
+        else:
+            blocks = cipher.decrypt_many(items, workers=workers)
+        yield from decode_blocks(blocks)
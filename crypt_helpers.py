@@ -10,19 +10,24 @@ description: cryptographic helper functions
 import os
 import random
 import math
-import hashlib
-import numpy as np
-from bitstring import BitArray
+from functools import lru_cache
+import instrument
 
 
 def get_primes():
     """
     reads file of primes numbers and returns a list.
-    use for testing.
+    use for testing. the file is found next to this module and parsed
+    once, later calls get a fresh copy of the same list.
     """
-    with open('./primes.txt') as f:
+    return list(_read_primes())
+
+
+@lru_cache(maxsize=1)
+def _read_primes():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'primes.txt')) as f:
             data = f.read()
-            primes = [int(x) for x in data[1:-1].split(',')]
+            primes = tuple(int(x) for x in data[1:-1].split(','))
     return primes
 
 
@@ -34,139 +39,543 @@ def os_random(order, m=math.inf, n=0):
     return int.from_bytes(os.urandom(order), byteorder='little')
 
 
-def primitive_root_search(m):
+@lru_cache(maxsize=256)
+def group_order_factors(p):
+    """
+    the set of prime factors of p - 1, the order of the multiplicative
+    group mod the prime p. cached, so repeated searches in one group
+    factor it only once.
+    """
+    return frozenset(eff_prime_factors(p - 1))
+
+
+def primitive_root_search(m, factors=None):
     """
     searches for a primitive root
+
+    r generates the group mod the prime m exactly when r ** ((m - 1) / f)
+    is not 1 for every prime factor f of m - 1. those factors are taken
+    from factors when given, for example {2, q} for a safe prime
+    m = 2q + 1, otherwise from group_order_factors.
     """
     
-    if not miller_rabin(m, 30):
+    if not miller_rabin(m):
         return -1
 
-    phi_m = phi(m)
+    phi_m = m - 1
+    exponents = [phi_m // f for f in (factors or group_order_factors(m))]
 
-    for r in range(2, phi_m):
-        flag = False
-        for f in eff_prime_factors(phi_m):
-            if fast_exp(r, (phi_m // f), m) == 1:
-                flag = True
-                break
-        if not flag:
+    for r in range(2, m):
+        if all(fast_exp(r, e, m) != 1 for e in exponents):
             return r
 
     return -1
 
 
+def small_primes(limit):
+    """
+    sieve of eratosthenes, returns a list of all primes below limit
+    """
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b'\x00\x00'
+    for p in range(2, math.isqrt(limit - 1) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = bytes(len(range(p * p, limit, p)))
+    return [p for p, is_prime in enumerate(sieve) if is_prime]
+
+
+# trial division table shared by the prime candidate sieve
+SMALL_PRIMES = small_primes(1 << 12)
+
+
+# the packed prime table covers every prime below this
+PRIME_TABLE_LIMIT = 1 << 24
+PRIME_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'primes.bin')
+
+
+class PrimeTable:
+    """
+    every prime below limit as an odd only bit array, bit i is set when
+    2i + 1 is prime, an eighth of a byte per odd number. stored in a
+    binary file, a 16 byte header of b'PRIMEBIT' and the limit, little
+    endian, then the bits, which is memory mapped rather than read so
+    only the pages touched are loaded. a missing file, or one covering
+    less than limit, is regenerated with an odd only sieve and written
+    back, or kept in memory if path is not writable.
+    """
+
+    MAGIC = b'PRIMEBIT'
+    HEADER = 16
+
+    def __init__(self, limit=PRIME_TABLE_LIMIT, path=PRIME_TABLE_PATH):
+        self.path = path
+        self._data = self._load(limit)
+        if self._data is None:
+            self._data = self._build(limit)
+        self.limit = int.from_bytes(self._data[8:16], 'little')
+
+
+    def _load(self, limit):
+        import mmap
+        try:
+            with open(self.path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        stored = int.from_bytes(data[8:16], 'little')
+        if data[:8] != self.MAGIC or stored < limit \
+                or len(data) != self.HEADER + -(-(stored // 2) // 8):
+            data.close()
+            return None
+        return data
+
+
+    def _build(self, limit):
+        import numpy as np
+        size = limit // 2
+        sieve = bytearray([1]) * size
+        sieve[:1] = b'\x00'
+        for i in range(1, (math.isqrt(max(limit - 1, 0)) - 1) // 2 + 1):
+            if sieve[i]:
+                p = 2 * i + 1
+                sieve[p * p // 2::p] = bytes(len(range(p * p // 2, size, p)))
+        bits = np.packbits(np.frombuffer(sieve, np.uint8), bitorder='little').tobytes()
+        data = self.MAGIC + limit.to_bytes(8, 'little') + bits
+        try:
+            # written whole then renamed, so readers never see half a table
+            tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+        return data
+
+
+    def __contains__(self, n):
+        """
+        table lookup below limit, miller_rabin above it
+        """
+        if n >= self.limit:
+            return miller_rabin(n)
+        if n < 3 or not n & 1:
+            return n == 2
+        i = n >> 1
+        return bool(self._data[self.HEADER + (i >> 3)] >> (i & 7) & 1)
+
+
+    def __iter__(self):
+        return iter(self.primes())
+
+
+    def primes(self, limit=None):
+        """
+        list of every prime below limit, the whole table by default.
+        decodes only the bytes it needs.
+        """
+        import numpy as np
+        limit = min(limit or self.limit, self.limit)
+        count = limit // 2
+        bits = np.unpackbits(np.frombuffer(self._data, np.uint8, -(-count // 8), self.HEADER),
+                             bitorder='little')[:count]
+        primes = (2 * np.flatnonzero(bits) + 1).tolist()
+        return [2] + primes if limit > 2 else primes
+
+
+_prime_table = None
+
+
+def prime_table(limit=None):
+    """
+    the shared PrimeTable, loaded on first use and regenerated if it
+    does not reach limit, PRIME_TABLE_LIMIT by default
+    """
+    global _prime_table
+    limit = limit or PRIME_TABLE_LIMIT
+    if _prime_table is None or _prime_table.limit < limit:
+        _prime_table = PrimeTable(max(limit, PRIME_TABLE_LIMIT))
+    return _prime_table
+
+
+def sieve_candidates(start, width, safe=False):
+    """
+    incremental sieve over the odd numbers start, start + 2, ...,
+    start + 2 * (width - 1). strikes out every multiple of the small prime
+    table in one slice assignment per prime and returns the survivors in
+    increasing order. start must be odd.
+
+    with safe set, also strikes every q where 2q + 1 has a small factor,
+    leaving candidates for the q of a safe prime 2q + 1.
+    """
+    marks = bytearray(width)
+    for p in SMALL_PRIMES[1:]:
+        # first offset i with start + 2i divisible by p, 2**-1 mod p is (p+1)/2
+        half = (p + 1) >> 1
+        i = (-start * half) % p
+        if start + 2 * i == p:
+            # never strike a small prime itself
+            i += p
+        if i < width:
+            marks[i::p] = b'\x01' * len(range(i, width, p))
+        if safe:
+            # first offset with 2(start + 2i) + 1 divisible by p
+            i = ((half - 1 - start) * half) % p
+            if 2 * (start + 2 * i) + 1 == p:
+                i += p
+            if i < width:
+                marks[i::p] = b'\x01' * len(range(i, width, p))
+    return [start + 2 * i for i, struck in enumerate(marks) if not struck and start + 2 * i > 1]
+
+
 def prime_search(order=5, true_random=False, safe=False):
     """
     Searches for and returns a prime number. Uses the 
     operating system's true random functions.
+
+    a random odd start is drawn, order bytes from the operating system or
+    order digits from blum blum shub when true_random is set, then the
+    window of odd numbers above it is sieved against the small prime
+    table. survivors get a single base 2 fermat round to abort early on
+    most remaining composites before the full miller rabin test. the
+    window never crosses into a larger order.
+
+    with safe set, returns a safe prime 2q + 1 where q is a prime of the
+    given order, both verified. the factors of p - 1 are then {2, q}.
     """
+    def probable(c):
+        return (c < 4 or fast_exp(2, c - 1, c) == 1) and miller_rabin(c)
+
+    limit = 10 ** order if true_random else 256 ** order
     p = 0
-    while not miller_rabin(p):
-        if true_random:
-            p = blum_blum_shub(order)
-        else:
-            p = os_random(order)
+    while not p:
+        start = (blum_blum_shub(order) if true_random else os_random(order)) | 1
+        width = min((8 if safe else 2) * start.bit_length() + 16, (limit - start + 1) // 2)
+        if width <= 0:
+            continue
+        if instrument.enabled:
+            instrument.count('sieve_windows')
+        for c in sieve_candidates(start, width, safe):
+            if probable(c) and (not safe or probable(2 * c + 1)):
+                p = c
+                break
     if safe:
         p = 2 * p + 1
     return p
 
 
+class _ByteSource:
+    """
+    integer helpers shared by the generators, built on their randbytes
+    """
+
+    def getrandbits(self, k):
+        """
+        returns a random non negative integer of at most k bits
+        """
+        if k <= 0:
+            return 0
+        b = int.from_bytes(self.randbytes((k + 7) // 8), byteorder='little')
+        return b >> (-k % 8)
+
+
+    def randbelow(self, k):
+        """
+        returns a random integer in [0, k), by rejection sampling so every
+        value is equally likely
+        """
+        bits = k.bit_length()
+        r = self.getrandbits(bits)
+        while r >= k:
+            r = self.getrandbits(bits)
+        return r
+
+
+    def randdigits(self, size):
+        """
+        returns a random integer with exactly size digits
+        """
+        low = 10 ** (size - 1)
+        return low + self.randbelow(10 ** size - low)
+
+
+class NaorReingold(_ByteSource):
+    """
+    keyed pseudo-random function after naor and reingold, usable as a
+    counter mode generator. all key material is drawn once at
+    construction: the modulus N = p * q from primes of order bytes, a
+    pair of exponents per input bit plus a leading one, a quadratic
+    residue g, and a random mask r for the output inner product. an n bit
+    input x maps to g ** (a0 * product of a[i][x_i]). the exponent product
+    is reduced mod phi(N), known here from p and q, through tables of the
+    product for every value of each byte of the input, so evaluating
+    costs one multiplication per input byte and a single exponentiation.
+    """
+
+    def __init__(self, n=64, order=5):
+        self.n = n
+        p = prime_search(order)
+        q = prime_search(order)
+        while q == p:
+            q = prime_search(order)
+        self.N = p * q
+        phi = (p - 1) * (q - 1)
+
+        def exponent():
+            a = os_random(2 * order) % phi
+            while a < 2 or gcd(a, phi) != 1:
+                a = os_random(2 * order) % phi
+            return a
+        a = [(exponent(), exponent()) for i in range(n)]
+
+        b = os_random(3)
+        while gcd(self.N, b) != 1:
+            b = os_random(3)
+        self.__g = b ** 2 % self.N
+
+        # a[i][bit] for each input bit, combined into tables of their
+        # product mod phi for every value of each byte of the input
+        self.__phi = phi
+        self.__a0 = exponent()
+        self.__tables = []
+        for start in range(0, n, 8):
+            table = [1]
+            for pair in a[start:start + 8]:
+                table = [(t * pair[0]) % phi for t in table] + [(t * pair[1]) % phi for t in table]
+            self.__tables.append(table)
+        self.__width = (self.N.bit_length() + 7) // 8
+        self.__r = os_random(self.__width) % (1 << self.N.bit_length())
+        self.__counter = 0
+
+
+    def _group_element(self, x):
+        """
+        g ** (a0 * product of a[i][x_i]) mod N for the n low bits of x,
+        the exponent built one multiplication mod phi per input byte
+        """
+        phi = self.__phi
+        e = self.__a0
+        for table in self.__tables:
+            e = (e * table[x & (len(table) - 1)]) % phi
+            x >>= 8
+        return fast_exp(self.__g, e, self.N)
+
+
+    def evaluate(self, x):
+        """
+        evaluates the function on one input, returning a single bit, the
+        parity of the group element masked by r
+        """
+        return bin(self._group_element(x) & self.__r).count('1') & 1
+
+
+    def evaluate_many(self, xs):
+        """
+        evaluates the function on every input in xs, returning a numpy
+        uint8 array of output bits. the masked parities are computed for
+        the whole batch at once over an unpacked bit matrix.
+        """
+        import numpy as np
+        width = self.__width
+        ys = b''.join(self._group_element(int(x)).to_bytes(width, byteorder='little') for x in xs)
+        rows = np.frombuffer(ys, dtype=np.uint8).reshape(-1, width)
+        r = np.frombuffer(self.__r.to_bytes(width, byteorder='little'), dtype=np.uint8)
+        bits = np.unpackbits(rows & r, axis=1)
+        return (bits.sum(axis=1, dtype=np.uint64) & 1).astype(np.uint8)
+
+
+    def randbytes(self, count):
+        """
+        returns count bytes of output, evaluating the function on
+        consecutive counter values
+        """
+        import numpy as np
+        start = self.__counter
+        self.__counter += 8 * count
+        bits = self.evaluate_many(range(start, self.__counter))
+        return np.packbits(bits, bitorder='little').tobytes()
+
+
+    def stream(self, chunk=4096):
+        """
+        generator yielding output in chunks of chunk bytes, without end
+        """
+        while True:
+            yield self.randbytes(chunk)
+
+
+class BlumBlumShub(_ByteSource):
+    """
+    cryptographically secure pseudo-random number generator, seeded once.
+    p and q are primes congruent to 3 mod 4 of order bytes each, drawn
+    with prime_search unless given. every squaring of the state mod
+    n = p * q yields its log2(log2(n)) low bits, which are packed straight
+    into the output buffer.
+    """
+
+    def __init__(self, order=16, seed=None, p=None, q=None):
+        while not p or p % 4 != 3:
+            p = prime_search(order)
+        while not q or q % 4 != 3 or q == p:
+            q = prime_search(order)
+        self.n = p * q
+        # bits that can be safely extracted per squaring
+        self.bits = max(1, int(math.log2(self.n.bit_length())))
+        self.__mask = (1 << self.bits) - 1
+        if seed is None:
+            seed = os_random(2 * order) % self.n
+        while seed < 2 or gcd(seed, self.n) != 1:
+            seed = os_random(2 * order) % self.n
+        self.__state = (seed * seed) % self.n
+        # extracted bits not yet handed out
+        self.__pool = 0
+        self.__pool_bits = 0
+
+
+    def randbytes(self, count):
+        """
+        returns count random bytes
+        """
+        buffer = bytearray(count)
+        x, n, j, mask = self.__state, self.n, self.bits, self.__mask
+        pool, pool_bits = self.__pool, self.__pool_bits
+        for i in range(count):
+            while pool_bits < 8:
+                x = (x * x) % n
+                pool |= (x & mask) << pool_bits
+                pool_bits += j
+            buffer[i] = pool & 0xFF
+            pool >>= 8
+            pool_bits -= 8
+        self.__state, self.__pool, self.__pool_bits = x, pool, pool_bits
+        return bytes(buffer)
+
+
+_bbs = None
+_nr = None
+
+
+def _reset_generators():
+    """
+    forked children must not replay the parent's generator state
+    """
+    global _bbs, _nr
+    _bbs = None
+    _nr = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_generators)
+
+
 def naor_reingold(size=10):
     """
     cryptographically secure pseudo-random number generator
-    """
-    n = os_random(1)
-    p = prime_search()
-    q = prime_search()
-    N = p * q
-    a = [(os_random(2), os_random(2)) for i in range(n)]
-
-    b = os_random(3)
-    while gcd(N,b) != 1:
-        b = os_random
-    g = b ** 2 % N
-
-    r = '{0:b}'.format(os_random(600))[:2*n]
-    r = np.array(list(r), dtype=int)
-
-    # using the generally agreed upon bit to digit ratio
-    limit = math.floor(size * math.log(10, 2))
-    bits = ''
-    for i in range(n):
-        x = [0 if os_random(1) >= 128 else 1 for i in range(n)]
-        e = np.sum(np.array([t[x[i]] for i, t in enumerate(a)]))
-        b_int = fast_exp(g,e,N)
-        b_bin = '{0:b}'.format(b_int).zfill(2*n)
-        bit = str(np.dot(r, np.array(list(b_bin), dtype=int)) % 2)
-        bits += bit
-        if len(bits) >= limit:
-            break
+    size is the number of digits in the generated integer
 
-    # ensure digits match the size argument
-    b = BitArray(bin=bits).uint
-    digits = len(str(b))
-    if digits < size:
-        diff = size - digits
-        b = int(''.join(['1'for i in range(diff)]) + str(b))
-    elif digits > size:
-        b = int(str(b)[:size])
-    return b
+    draws from a module wide NaorReingold generator, created and keyed on
+    first use.
+    """
+    global _nr
+    if _nr is None:
+        _nr = NaorReingold()
+    return _nr.randdigits(size)
 
 
 def blum_blum_shub(size=10):
     """
     cryptographically secure pseudo-random number generator
     size is the number of digits in the generated integer
+
+    draws from a module wide BlumBlumShub generator, created and seeded
+    on first use.
     """
-    p = 0
-    q = 0
-    while p % 4 != 3:
-        p = prime_search()
-    while q % 4 != 3:
-        q = prime_search()
-    n = p * q
-    seed = os_random(5) % n
-    # using the generally agreed upon bit to digit ratio
-    limit = math.floor(size * math.log(10, 2))
-    Si = seed
-    bits = ''
-    for i in range(n-1):
-        if len(bits) >= limit:
-            break
-        if gcd(n,i) == 1:
-            Sj = fast_exp(Si, 2, n)
-            bits += str(Sj % 2)
-            Si = Sj 
+    global _bbs
+    if _bbs is None:
+        _bbs = BlumBlumShub()
+    return _bbs.randdigits(size)
 
-    # ensure digits match the size argument
-    b = BitArray(bin=bits).uint
-    digits = len(str(b))
-    if digits < size:
-        diff = size - digits
-        b = int(''.join(['1'for i in range(diff)]) + str(b))
-    elif digits > size:
-        b = int(str(b)[:size])
-    return b
 
+# miller rabin witness sets proven deterministic for every n below each bound
+MR_DETERMINISTIC = [
+    (2047, (2,)),
+    (1373653, (2, 3)),
+    (25326001, (2, 3, 5)),
+    (3215031751, (2, 3, 5, 7)),
+    (2152302898747, (2, 3, 5, 7, 11)),
+    (3474749660383, (2, 3, 5, 7, 11, 13)),
+    (341550071728321, (2, 3, 5, 7, 11, 13, 17)),
+    (3825123056546413051, (2, 3, 5, 7, 11, 13, 17, 19, 23)),
+    (318665857834031151167461, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)),
+    (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+]
 
-def miller_rabin(n, k=30, safe=False):
+
+def mr_rounds(bits):
+    """
+    number of random miller rabin rounds needed to push the error for a
+    random candidate of the given bit length below 2**-80, after the
+    handbook of applied cryptography table 4.4. larger candidates need far
+    fewer rounds because most composites fail the very first one.
+    """
+    for size, rounds in ((1300, 2), (850, 3), (650, 4), (550, 5), (450, 6), (400, 7),
+                         (350, 8), (300, 9), (250, 12), (200, 15), (150, 18), (100, 27)):
+        if bits >= size:
+            return rounds
+    return 30
+
+
+def _small_factor(n):
+    """
+    settles primality for tiny n and anything with a small factor. returns
+    True or False when decided, None when n needs a full test.
+    """
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES[:25]:
+        if n % p == 0:
+            return n == p
+    if n < 10201:
+        # 101 ** 2, so n has no factor below its square root
+        return True
+    return None
+
+
+def _strong_probable_prime(n, a, m, r):
+    """
+    one miller rabin round to base a, where n - 1 = 2**r * m
+    """
+    if instrument.enabled:
+        instrument.count('mr_rounds')
+    b = fast_exp(a, m, n)
+    if b == 1 or b == n - 1:
+        return True
+    for _ in range(r - 1):
+        b = fast_exp(b, 2, n)
+        if b == n - 1:
+            return True
+    return False
+
+
+def miller_rabin(n, k=None, safe=False):
     """
     probabilistic prime checker
     n: integer to check for primality
     k: number of tests to perform, translates to 1 - (0.25) ** k 
-    probablity that n is prime
+    probablity that n is prime. by default the number of tests is scaled
+    to the bit length of n with mr_rounds
     safe: if true, performs a secondary check to ensure n is a safe
     prime
-    """
 
-    # catch easy primes
-    if n == 2 or n == 3:
-        return True
+    below 3.3e24 a fixed witness set is used instead and the answer is
+    exact.
+    """
+    if safe:
+        return miller_rabin(n, k) and miller_rabin((n - 1) // 2, k)
 
-    # catch all even numbers
-    if n % 2 == 0:
-        return False
+    # catch easy primes and composites with a small factor
+    small = _small_factor(n)
+    if small is not None:
+        return small
 
     # initialize r and m
     # n - 1 = 2**r * m
@@ -175,85 +584,608 @@ def miller_rabin(n, k=30, safe=False):
     while m % 2 == 0:
         r += 1
         m //= 2
+
+    for bound, witnesses in MR_DETERMINISTIC:
+        if n < bound:
+            return all(_strong_probable_prime(n, a, m, r) for a in witnesses)
+
     # outer loop, try k times
+    k = k or mr_rounds(n.bit_length())
     for _ in range(k):
-        a = random.randint(2, n - 1)
-        b = fast_exp(a, m, n)
-        if b == 1 or b == n - 1:
-            continue
-        for _ in range(r - 1):
-            b = fast_exp(b, 2, n)
-            if b == n - 1:
-                break
-        else:
+        a = random.randint(2, n - 2)
+        if not _strong_probable_prime(n, a, m, r):
             return False
 
-    # add safe in here
+    return True
 
 
-    return True
+def jacobi(a, n):
+    """
+    jacobi symbol (a/n) for odd positive n, returns -1, 0 or 1
+    """
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def strong_lucas(n):
+    """
+    strong lucas probable prime test with selfridge's parameters, n must
+    be odd and greater than 2
+    """
+    if math.isqrt(n) ** 2 == n:
+        return False
+    # first D in 5, -7, 9, -11, ... with (D/n) = -1
+    D = 5
+    while True:
+        j = jacobi(D, n)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != n:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P, Q = 1, (1 - D) // 4
+
+    # n + 1 = 2**s * d
+    s, d = 0, n + 1
+    while d % 2 == 0:
+        s += 1
+        d //= 2
+
+    def half(x):
+        x %= n
+        return (x + n if x & 1 else x) // 2
+
+    # left to right binary ladder for U_d, V_d and Q**d
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        U, V, Qk = (U * V) % n, (V * V - 2 * Qk) % n, (Qk * Qk) % n
+        if bit == '1':
+            U, V, Qk = half(P * U + V), half(D * U + P * V), (Qk * Q) % n
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        if V == 0:
+            return True
+        Qk = (Qk * Qk) % n
+    return False
+
+
+def baillie_psw(n):
+    """
+    baillie psw primality test, a base 2 miller rabin round followed by a
+    strong lucas test. no composite is known to pass it and it has been
+    checked exhaustively below 2**64.
+    """
+    small = _small_factor(n)
+    if small is not None:
+        return small
+    r, m = 0, n - 1
+    while m % 2 == 0:
+        r += 1
+        m //= 2
+    return _strong_probable_prime(n, 2, m, r) and strong_lucas(n)
+
+
+def is_prime(n, method='miller_rabin', k=None):
+    """
+    primality check with a selectable test. below PRIME_TABLE_LIMIT the
+    answer is a lookup in the shared prime table instead. method is one of
+    miller_rabin - deterministic below 3.3e24, k or mr_rounds random
+                   rounds above
+    bpsw         - baillie psw, a fixed cost of roughly three miller
+                   rabin rounds regardless of size
+    """
+    if n < PRIME_TABLE_LIMIT and k is None:
+        return n in prime_table()
+    if method == 'miller_rabin':
+        return miller_rabin(n, k)
+    elif method == 'bpsw':
+        return baillie_psw(n)
+    raise Exception(f'Unknown primality test {method}.')
+
+
+# default memory budget for the baby step table, in bytes
+BSGS_MEMORY = 1 << 28
 
 
-def baby_step_giant_step(a, b, mod):
+def baby_step_giant_step(a, b, mod, order=None, memory=None, block=4096):
     """
     solves discrete log problem given an answer a, log base b, and
     modular group mod.
+
+    order is an upper bound on the order of b, carmichael(mod) by
+    default, which is mod - 1 for every prime mod. baby steps are stored
+    as a sorted numpy array of their low 64 bits, with every match
+    verified against the full value, so the table costs a fixed 24 bytes
+    per entry whatever the size of mod. every step is one modular
+    multiplication.
+
+    memory caps the table in bytes, BSGS_MEMORY by default. when a full
+    sqrt(order) table does not fit, a smaller table is built and the
+    number of giant steps grows to match. giant steps are looked up in
+    blocks of block at a time.
     """
-    n = phi(mod)
-    m = math.ceil((n**0.5) % mod)
-    # baby step, more efficient to store in dict
-    j = {fast_exp(b, j, mod) : j for j in range(m)}
-    # fermat's little theorem, c = (b**-1)**m = b**(phi(mod)-1)**m
-    c = fast_exp(fast_exp(b, (n - 1), mod), m, mod)
-    # giant step, similar to j, but break and return if a match is found
-    for i in range(m):
-        y = (a * fast_exp(c, i, mod)) % mod
-        if y in j:
-            return (i * m) + j[y] % n
+    import numpy as np
+    n = order or carmichael(mod)
+    mask = (1 << 64) - 1
+    # ceil(sqrt(n)) baby steps, or as many as the memory budget allows
+    m = max(1, math.isqrt(n - 1) + 1 if n > 1 else 1)
+    m = max(1, min(m, (memory or BSGS_MEMORY) // 24))
+    giant = -(-n // m)
+
+    def baby_steps():
+        y = 1
+        for _ in range(m):
+            yield y & mask
+            y = (y * b) % mod
+
+    # baby step, stored sorted for binary search
+    keys = np.fromiter(baby_steps(), dtype=np.uint64, count=m)
+    index = np.argsort(keys, kind='stable')
+    keys = keys[index]
+    if instrument.enabled:
+        instrument.count('bsgs_tables')
+        instrument.count('bsgs_table_entries', m)
+    # c = b**-m
+    c = cached_inverse(fast_exp(b, m, mod), mod)
+    # giant step, a * c**i for each i, looked up a block at a time
+    y = a % mod
+    for start in range(0, giant, block):
+        steps = []
+        for _ in range(min(block, giant - start)):
+            steps.append(y)
+            y = (y * c) % mod
+        lookup = np.fromiter((s & mask for s in steps), dtype=np.uint64, count=len(steps))
+        positions = np.searchsorted(keys, lookup)
+        for k in np.nonzero(positions < m)[0]:
+            # walk every baby step sharing the truncated key, smallest j first
+            p = int(positions[k])
+            while p < m and keys[p] == lookup[k]:
+                j = int(index[p])
+                if fast_exp(b, j, mod) == steps[k]:
+                    return (start + int(k)) * m + j
+                p += 1
     # failure if no overlap found
     return None
 
 
-def fast_exp(x, e, m, show=False, y=1):
+def _rho_log_step(x, u, v, a, b, mod, q):
+    """
+    one step of the pollard rho walk for logarithms, x = b**u * a**v with
+    the exponents tracked mod the prime order q. the walk is split three
+    ways on x mod 3.
+    """
+    s = x % 3
+    if s == 0:
+        return (x * a) % mod, u, (v + 1) % q
+    elif s == 1:
+        return (x * x) % mod, (2 * u) % q, (2 * v) % q
+    return (x * b) % mod, (u + 1) % q, v
+
+
+def pollards_rho_log(a, b, mod, order, attempts=20):
+    """
+    pollard's rho for logarithms, solves b**x = a mod mod where b has
+    prime order order. uses constant memory, brent's cycle finding runs
+    one pseudo random walk until it meets itself, and the two ways of
+    reaching the meeting point give a linear equation for x. retries from
+    a fresh random start up to attempts times, returns None if a is not
+    a power of b.
+    """
+    q = order
+    a %= mod
+    for _ in range(attempts):
+        u, v = random.randrange(q), random.randrange(q)
+        x = (fast_exp(b, u, mod) * fast_exp(a, v, mod)) % mod
+        saved = (x, u, v)
+        x, u, v = _rho_log_step(x, u, v, a, b, mod, q)
+        power = lam = 1
+        while x != saved[0]:
+            if power == lam:
+                saved = (x, u, v)
+                power *= 2
+                lam = 0
+            x, u, v = _rho_log_step(x, u, v, a, b, mod, q)
+            lam += 1
+        if instrument.enabled:
+            # brent's windows 1, 2, 4, ... then lam steps into the last
+            instrument.count('rho_log_steps', power - 1 + lam)
+        # b**u * a**v = b**U * a**V, so u - U = x * (V - v) mod q
+        dv = (saved[2] - v) % q
+        if dv == 0:
+            continue
+        x = ((u - saved[1]) * mod_inverse(dv, q)) % q
+        if fast_exp(b, x, mod) == a:
+            return x
+    return None
+
+
+def _prime_order_log(a, b, mod, q, method='auto', memory=None, solver=None):
+    """
+    discrete log in a subgroup of prime order q. baby step giant step
+    while its sqrt(q) table fits the memory budget, pollard's rho beyond.
+    solver replaces pollards_rho_log, called as solver(a, b, mod, q).
+    """
+    if q < 4:
+        # tiny subgroup, try every exponent
+        return next((x for x in range(q) if fast_exp(b, x, mod) == a % mod), None)
+    if method == 'bsgs' or (method == 'auto' and (math.isqrt(q) + 1) * 24 <= (memory or BSGS_MEMORY)):
+        return baby_step_giant_step(a, b, mod, q, memory)
+    return (solver or pollards_rho_log)(a, b, mod, q)
+
+
+def pohlig_hellman(a, b, mod, factors, method='auto', memory=None, solver=None):
+    """
+    pohlig hellman reduction, solves b**x = a mod mod given the prime
+    factorization {q: e} of a multiple of the order of b, mod - 1 for a
+    prime mod. the exact order of b is found first, then x is solved mod
+    every prime power q**e of it, one base q digit at a time with a
+    discrete log in the subgroup of order q, and the results are joined
+    with the chinese remainder theorem. the work is driven by the largest
+    prime factor, not the size of the group. returns None if a is not a
+    power of b. solver replaces pollard's rho in the prime subgroups, see
+    _prime_order_log.
+    """
+    factors = dict(factors)
+    n = 1
+    for q, e in factors.items():
+        n *= q ** e
+    # trim the order down to the exact order of b
+    for q in factors:
+        while factors[q] and fast_exp(b, n // q, mod) == 1:
+            n //= q
+            factors[q] -= 1
+
+    congruences = []
+    for q, e in factors.items():
+        if not e:
+            continue
+        qe = q ** e
+        g = fast_exp(b, n // qe, mod)
+        h = fast_exp(a, n // qe, mod)
+        # gamma has order exactly q
+        gamma = fast_exp(g, q ** (e - 1), mod)
+        g_inv = cached_inverse(g, mod)
+        x = 0
+        for k in range(e):
+            hk = fast_exp((fast_exp(g_inv, x, mod) * h) % mod, q ** (e - 1 - k), mod)
+            d = _prime_order_log(hk, gamma, mod, q, method, memory, solver)
+            if d is None:
+                return None
+            x += d * q ** k
+        congruences.append((x, qe))
+
+    x = crt(congruences) if congruences else 0
+    return x if fast_exp(b, x, mod) == a % mod else None
+
+
+def discrete_log(a, b, mod, order=None, method='auto', memory=None, solver=None):
+    """
+    solves b**x = a mod mod, choosing an algorithm. order is a multiple of
+    the order of b, carmichael(mod) by default, so mod - 1 for a prime
+    mod. method is one of
+        auto           - pohlig hellman over the factorization of order,
+                         each prime subgroup solved with baby step giant
+                         step while its table fits in memory, pollard's
+                         rho when it does not
+        pohlig_hellman - same as auto
+        rho            - pohlig hellman with every subgroup solved by
+                         pollard's rho, constant memory
+        bsgs           - plain baby step giant step over the whole group
+    solver replaces pollard's rho in the prime subgroups, see
+    _prime_order_log.
+    """
+    n = order or carmichael(mod)
+    if method == 'bsgs':
+        return baby_step_giant_step(a, b, mod, n, memory)
+    elif method in ('auto', 'pohlig_hellman', 'rho'):
+        sub = 'rho' if method == 'rho' else 'auto'
+        return pohlig_hellman(a, b, mod, factorize(n), sub, memory, solver)
+    raise Exception(f'Unknown discrete log method {method}.')
+
+
+def fast_exp(x, e, m, y=1, method='auto', window=None):
     """
     Function allowing efficient exponentiation within a modular group.
     X is the number to raise
     E is the power to raise it to
     M is the modulus
+    method selects the multiplication engine used for the powering:
+        auto       - python's built-in three argument pow, a C sliding
+                     window implementation. fastest, used by default
+        window     - iterative left to right sliding window
+        montgomery - sliding window over montgomery form operands,
+                     requires an odd modulus
+        binary     - iterative square and multiply, one bit at a time
+    window optionally fixes the window width in bits, otherwise it is
+    chosen from the size of the exponent.
+    counted by instrument as one fast_exp and its square and multiply
+    equivalent in modmul. while tracing, the binary method is used and
+    every step is recorded as an exp_step event.
     """
-    if show:
-        print(f'x = {x}  e = {e} y = {y}')
-    if e == 0:
-        # print('DONE')
-        return y
-    elif (e % 2 == 0):
-        x = (x**2) % m
-        e //= 2
-        # print('EVEN')
-        return fast_exp(x, e, m, show, y)
+    if instrument.enabled:
+        instrument.count('fast_exp')
+        instrument.count('modmul', abs(e).bit_length() + bin(e).count('1'))
+        if instrument.tracing:
+            method = 'binary'
+    if method == 'auto':
+        r = pow(x, e, m)
+    elif e < 0:
+        raise Exception('Negative exponents are only supported by the auto method.')
+    elif method == 'window':
+        r = _window_exp(x, e, m, window)
+    elif method == 'montgomery':
+        r = _montgomery_exp(x, e, m, window) if m % 2 else _window_exp(x, e, m, window)
+    elif method == 'binary':
+        return _binary_exp(x, e, m, y)
     else:
-        y = (y*x) % m
-        e -= 1
-        # print('ODD')
-        return fast_exp(x, e, m, show, y)
+        raise Exception(f'Unknown exponentiation method {method}.')
+    return r if y == 1 else (y * r) % m
+
+
+def _binary_exp(x, e, m, y=1):
+    """
+    right to left square and multiply, one exponent bit per step
+    """
+    trace = instrument.tracing
+    while e:
+        if trace:
+            instrument.event('exp_step', x=x, e=e, y=y)
+        if e % 2 == 0:
+            x = (x * x) % m
+            e //= 2
+        else:
+            y = (y * x) % m
+            e -= 1
+    if trace:
+        instrument.event('exp_step', x=x, e=e, y=y)
+    return y
+
+
+def _window_bits(e):
+    """
+    picks a sliding window width for an exponent, wider windows pay
+    for their larger precomputed table only on long exponents
+    """
+    bits = e.bit_length()
+    if bits > 671:
+        return 6
+    elif bits > 239:
+        return 5
+    elif bits > 79:
+        return 4
+    elif bits > 23:
+        return 3
+    return 1
 
 
-def gcd(m, n, show=False):
+def _window_digits(e, k):
+    """
+    splits e into a left to right list of (squarings, digit) pairs for
+    sliding window exponentiation. every digit is odd and at most k bits
+    wide, a digit of 0 marks trailing squarings.
+    """
+    digits = []
+    zeros = 0
+    i = e.bit_length() - 1
+    while i >= 0:
+        if not (e >> i) & 1:
+            zeros += 1
+            i -= 1
+            continue
+        # longest window ending in a set bit
+        low = max(i - k + 1, 0)
+        while not (e >> low) & 1:
+            low += 1
+        width = i - low + 1
+        digits.append((zeros + width, (e >> low) & ((1 << width) - 1)))
+        zeros = 0
+        i = low - 1
+    if zeros:
+        digits.append((zeros, 0))
+    return digits
+
+
+def _window_exp(x, e, m, k=None):
+    """
+    iterative sliding window exponentiation
+    """
+    if e == 0:
+        return 1 % m
+    k = k or _window_bits(e)
+    # odd powers x, x**3, ..., x**(2**k - 1)
+    x = x % m
+    x2 = (x * x) % m
+    table = [x]
+    for _ in range((1 << (k - 1)) - 1):
+        table.append((table[-1] * x2) % m)
+
+    digits = _window_digits(e, k)
+    r = table[digits[0][1] >> 1]
+    for s, d in digits[1:]:
+        for _ in range(s):
+            r = (r * r) % m
+        if d:
+            r = (r * table[d >> 1]) % m
+    return r
+
+
+def _montgomery_exp(x, e, m, k=None):
+    """
+    sliding window exponentiation with every product kept in montgomery
+    form, swapping the division in each reduction for shifts and masks.
+    m must be odd.
+    """
+    if e == 0:
+        return 1 % m
+    k = k or _window_bits(e)
+    shift = m.bit_length()
+    mask = (1 << shift) - 1
+    # -m**-1 mod 2**shift by newton iteration, each step doubles the
+    # number of correct low bits
+    inv = 1
+    for _ in range(shift.bit_length()):
+        inv = (inv * (2 - m * inv)) & mask
+    m_prime = -inv & mask
+
+    def redc(t):
+        t = (t + (((t & mask) * m_prime) & mask) * m) >> shift
+        return t - m if t >= m else t
+
+    xm = ((x % m) << shift) % m
+    x2 = redc(xm * xm)
+    table = [xm]
+    for _ in range((1 << (k - 1)) - 1):
+        table.append(redc(table[-1] * x2))
+
+    digits = _window_digits(e, k)
+    r = table[digits[0][1] >> 1]
+    for s, d in digits[1:]:
+        for _ in range(s):
+            r = redc(r * r)
+        if d:
+            r = redc(r * table[d >> 1])
+    return redc(r)
+
+
+def fixed_base_table(base, m, bits, window=None):
+    """
+    precomputes powers of a fixed base for repeated exponentiation in the
+    modular group m, covering exponents of up to bits bits. row i of the
+    table holds base ** (j * 2 ** (window * i)) for every window sized
+    digit j, so fixed_base_exp needs no squarings at all. returns a tuple
+    of (window, rows).
+    """
+    if not window:
+        window = 8 if bits > 64 else 4
+    rows = []
+    b = base % m
+    for _ in range(max(1, -(-bits // window))):
+        row = [1 % m, b]
+        for _ in range((1 << window) - 2):
+            row.append((row[-1] * b) % m)
+        rows.append(row)
+        # base for the next row, b ** (2 ** window)
+        b = (row[-1] * b) % m
+    return window, rows
+
+
+def fixed_base_exp(table, e, m):
+    """
+    exponentiates using a table built by fixed_base_table, one modular
+    multiplication per non zero window of the exponent. exponents wider
+    than the table fall back to fast_exp.
+    """
+    window, rows = table
+    if e.bit_length() > window * len(rows):
+        return fast_exp(rows[0][1], e, m)
+    mask = (1 << window) - 1
+    r = 1 % m
+    for row in rows:
+        if not e:
+            break
+        d = e & mask
+        if d:
+            r = (r * row[d]) % m
+        e >>= window
+    return r
+
+
+def batch_inverse(values, m):
+    """
+    inverts every value in the modular group m with a single modular
+    inversion, using montgomery's trick of running products. all values
+    must be invertible mod m.
+    """
+    prefix = []
+    acc = 1
+    for v in values:
+        acc = (acc * v) % m
+        prefix.append(acc)
+    if not prefix:
+        return []
+    inv = mod_inverse(acc, m)
+    inverses = [0] * len(prefix)
+    for i in range(len(prefix) - 1, 0, -1):
+        inverses[i] = (inv * prefix[i - 1]) % m
+        inv = (inv * values[i]) % m
+    inverses[0] = inv
+    return inverses
+
+
+# operands wider than this are reduced with lehmer's algorithm in gcd
+LEHMER_BITS = 8192
+
+
+def gcd(m, n):
     """
     Euclidean algorithm for determining greatest common divisor
-    ensure m > n to show clean work.
-    set show to True to print out work
+    ensure m > n to trace clean work.
+    while instrument is tracing, every division step is recorded as a
+    gcd_step event.
+
+    iterative, operands over LEHMER_BITS bits are first cut down with
+    lehmer's algorithm.
     """
-    if m == 0:
-        return n
-    else:
-        if show:
-            print(f'{m} = {m//(n%m)} * {n%m} + {m - (m//(n%m))*(n%m)}')
-            if m - (m//(n%m))*(n%m) == 1:
-                return 1
-            else:
-                return gcd(n % m, m)
-        return gcd(n % m, m)
+    if instrument.enabled:
+        instrument.count('gcd')
+        if instrument.tracing:
+            return _gcd_trace(m, n)
+    m, n = abs(m), abs(n)
+    if m.bit_length() > LEHMER_BITS and n.bit_length() > LEHMER_BITS:
+        return _lehmer_gcd(m, n)
+    while m:
+        m, n = n % m, m
+    return n
+
+
+def _gcd_trace(m, n):
+    """
+    euclidean algorithm recording each division step, n = q * m + r
+    """
+    while m:
+        instrument.event('gcd_step', n=n, q=n // m, m=m, r=n % m)
+        m, n = n % m, m
+    return n
+
+
+def _lehmer_gcd(a, b):
+    """
+    lehmer's gcd. runs the euclidean quotient sequence on the leading 64
+    bits of both operands with small integers for as long as it provably
+    matches the full one, then applies the collected steps to the full
+    operands with a single 2x2 matrix product. knuth's algorithm L.
+    """
+    if a < b:
+        a, b = b, a
+    while b.bit_length() > 64:
+        shift = a.bit_length() - 64
+        x, y = a >> shift, b >> shift
+        A, B, C, D = 1, 0, 0, 1
+        while y + C and y + D:
+            q = (x + A) // (y + C)
+            if q != (x + B) // (y + D):
+                break
+            A, B, x, C, D, y = C, D, y, A - q * C, B - q * D, x - q * y
+        if B == 0:
+            # no progress on the leading bits, take one full step
+            a, b = b, a % b
+        else:
+            a, b = A * a + B * b, C * a + D * b
+    while b:
+        a, b = b, a % b
+    return a
 
 
 def ext_gcd(m, n):
@@ -261,21 +1193,56 @@ def ext_gcd(m, n):
     Extended Euclidean algorithm. Returns a pair of integers such that xm + yn
     returns the smallest possible positive integer
     """
-    if m == 0:
-        return n, 0, 1
-    else:
-        div, x, y = ext_gcd(n % m, m)
-        return div, y - n // m * x, x
+    if instrument.enabled:
+        instrument.count('ext_gcd')
+    # invariants a = xa * m + ya * n and b = xb * m + yb * n
+    a, xa, ya = m, 1, 0
+    b, xb, yb = n, 0, 1
+    while a:
+        q = b // a
+        a, xa, ya, b, xb, yb = b - q * a, xb - q * xa, yb - q * ya, a, xa, ya
+    return b, xb, yb
 
 
-def phi(n):
+# most recently used modular inverses kept by cached_inverse
+MOD_INVERSE_CACHE = 4096
+
+
+def mod_inverse(a, m):
     """
-    Helper function to find the size of the group
+    returns the inverse of a in the modular group m, via the extended
+    euclidean algorithm. nothing is kept, so this is the one to use on
+    private keys and shared secrets.
     """
-    if miller_rabin(n):
-        return n-1
-    else:
-        return len([x for x in range(1, n) if gcd(x, n) == 1])
+    div, _, inverse = ext_gcd(m, a % m)
+    if div != 1:
+        raise Exception(f'{a} has no inverse mod {m}.')
+    return inverse % m
+
+
+@lru_cache(maxsize=MOD_INVERSE_CACHE)
+def cached_inverse(a, m):
+    """
+    mod_inverse cached on (a, m) for the whole process, so repeated
+    inverses of the same public value cost a dictionary lookup. never
+    pass it anything secret.
+    """
+    return mod_inverse(a, m)
+
+
+def crt(congruences):
+    """
+    chinese remainder theorem, takes a list of (residue, modulus) pairs
+    with pairwise coprime moduli and returns the unique solution modulo
+    their product.
+    """
+    x, n = 0, 1
+    for r, m in congruences:
+        # lift x mod n to the solution mod n * m
+        t = ((r - x) * cached_inverse(n, m)) % m
+        x += n * t
+        n *= m
+    return x % n
 
 
 def eff_prime_factors(n):
@@ -283,55 +1250,282 @@ def eff_prime_factors(n):
     function to find a set of all prime factors for any 
     given n. takes in an integer, returns a set.
     """
-    factors = set()
+    return set(factorize(n))
 
-    while n % 2 == 0:
-        factors.add(2),
-        n = n // 2
 
-    for i in range(3, int(n**0.5)+1, 2):
-        while n % i == 0:
-            factors.add(i),
-            n = n // i
+# most recently used factorizations kept by factorize
+FACTOR_CACHE = 1024
 
-    if n > 2:
-        factors.add(n)
 
-    return factors
+def factorize(n):
+    """
+    prime factorization of n as a dict of {prime: exponent}, see
+    _factorize. a fresh dict every call, so callers may change it.
+    """
+    return dict(_factorize(n))
 
 
-def pollards_rho(n, x=2, limit=5):
+@lru_cache(maxsize=FACTOR_CACHE)
+def _factorize(n):
+    """
+    factoring engine behind factorize. divides out the small prime table
+    first, a wheel that stops at the square root of what is left, then
+    splits any remaining cofactor with find_factor, recursing on both
+    halves until every part passes miller_rabin. a cofactor with no
+    factor in the table below the square of its largest prime is prime
+    outright. returns sorted (prime, exponent) pairs, cached on n.
     """
-    hitting recursion limit, refactor to 2 loops?
-    prime init is helping...
+    if n < 1:
+        raise Exception(f'cannot factor {n}.')
+    if instrument.enabled:
+        instrument.count('factorize')
+    factors = {}
+    for p in SMALL_PRIMES:
+        if p * p > n:
+            break
+        if n % p == 0:
+            e = 0
+            while n % p == 0:
+                n //= p
+                e += 1
+            factors[p] = e
+
+    cofactors = [n] if n > 1 else []
+    while cofactors:
+        m = cofactors.pop()
+        if m < SMALL_PRIMES[-1] ** 2 or miller_rabin(m):
+            factors[m] = factors.get(m, 0) + 1
+        else:
+            d = find_factor(m)
+            cofactors += [d, m // d]
+    return tuple(sorted(factors.items()))
+
+
+@lru_cache(maxsize=FACTOR_CACHE)
+def phi(n):
+    """
+    Helper function to find the size of the group, euler's totient. the
+    product of p**(e-1) * (p - 1) over the factorization of n, so it costs
+    one factorize call and no memory beyond it. cached.
+    """
+    result = 1
+    for p, e in factorize(n).items():
+        result *= p ** (e - 1) * (p - 1)
+    return result
+
+
+@lru_cache(maxsize=FACTOR_CACHE)
+def carmichael(n):
+    """
+    carmichael's lambda, the exponent of the group mod n, the smallest m
+    with x**m = 1 mod n for every x coprime to n. so the order of every
+    element divides it. the lcm over the factorization of n of
+    p**(e-1) * (p - 1), except 2**e past 4 which only reaches 2**(e-2).
+    cached.
+    """
+    result = 1
+    for p, e in factorize(n).items():
+        order = 1 << (e - 2) if p == 2 and e > 2 else p ** (e - 1) * (p - 1)
+        result = result * order // gcd(result, order)
+    return result
+
+
+def brent_walk(n, x=2, c=1, batch=100, limit=None, stop=None):
     """
-    if miller_rabin(n, 30):
+    a single pollard rho walk, f(x) = x**2 + c mod n, with brent's cycle
+    detection. differences |x - y| are multiplied together mod n and one
+    gcd is taken per batch steps, backtracking one step at a time only if
+    the batch overshoots to a gcd of n. gives up after limit steps, or
+    as soon as the event stop is set, checked once per batch.
+    returns (divisor, steps) where divisor is None when the walk ran out
+    and n when it failed, and should be restarted with another c.
+    """
+    y, r, q, g = x % n, 1, 1, 1
+    steps = 0
+    while g == 1:
+        x = y
+        for _ in range(r):
+            y = (y * y + c) % n
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for _ in range(min(batch, r - k)):
+                y = (y * y + c) % n
+                q = (q * abs(x - y)) % n
+            g = gcd(q, n)
+            k += batch
+            if stop is not None and g == 1 and stop.is_set():
+                return None, steps + r + k
+        steps += 2 * r
+        r *= 2
+        if limit and steps >= limit and g == 1:
+            return None, steps
+    if g == n:
+        # the batch product swallowed the factor, replay it step by step
+        while True:
+            ys = (ys * ys + c) % n
+            g = gcd(abs(x - ys), n)
+            if g > 1:
+                break
+    return g, steps
+
+
+def pollards_rho(n, x=2, c=1, batch=100, limit=None):
+    """
+    pollard's rho factorization with brent's cycle detection, returns a
+    non trivial factor of the composite n. every value stays reduced
+    mod n and one gcd is taken per batch of steps. failed walks restart
+    from a random x and c. with limit set, gives up and returns None after
+    that many steps in total.
+    """
+    if miller_rabin(n):
         raise Exception('n is prime you fool.')
+    if n % 2 == 0:
+        return 2
+
+    total = 0
+    while True:
+        g, steps = brent_walk(n, x, c, batch, limit and limit - total)
+        total += steps
+        if instrument.enabled:
+            instrument.count('rho_steps', steps)
+        if g and g != n:
+            return g
+        if limit and total >= limit:
+            return None
+        x = random.randint(2, n - 2)
+        c = random.randint(1, n - 1)
+
+
+class _NotInvertible(Exception):
+    """
+    raised by the curve arithmetic when a denominator shares a factor
+    with n, which is exactly what lenstra's method is looking for
+    """
+
+    def __init__(self, divisor):
+        super().__init__(divisor)
+        self.divisor = divisor
+
+
+def _ec_add(P, Q, a, n):
+    """
+    adds two points on y**2 = x**3 + ax + b mod n in affine coordinates,
+    None is the point at infinity
+    """
+    if P is None:
+        return Q
+    if Q is None:
+        return P
+    x1, y1 = P
+    x2, y2 = Q
+    if x1 == x2:
+        if (y1 + y2) % n == 0:
+            return None
+        num, den = 3 * x1 * x1 + a, 2 * y1
+    else:
+        num, den = y2 - y1, x2 - x1
+    g, _, inv = ext_gcd(n, den % n)
+    if g != 1:
+        raise _NotInvertible(g)
+    lam = (num * inv) % n
+    x3 = (lam * lam - x1 - x2) % n
+    return x3, (lam * (x1 - x3) - y1) % n
 
-    c = 1
-    g = 1
-    count = 1
-    f = lambda x: x**2 + c % n
-    while (g == 1):
-        # tortoise
-        x = f(x)
-        # hare
-        y = f(f(x))
-        g = gcd(abs(x-y), n)
-        count += 1
-        if (g == n) or (count >= limit):
-            x = random.randint(2, n-2)
-            c = random.randint(2, n-1)
-            y = x
-            count = 1
+
+def _ec_mul(k, P, a, n):
+    """
+    scalar multiplication by double and add
+    """
+    R = None
+    while k:
+        if k & 1:
+            R = _ec_add(R, P, a, n)
+        P = _ec_add(P, P, a, n)
+        k >>= 1
+    return R
+
+
+def lenstra_ecm(n, curves=50, bound=2000):
+    """
+    lenstra's elliptic curve factorization, stage one. each random curve
+    through a random point mod n is multiplied by every prime power up to
+    bound. a factor p of n turns up when the order of the curve mod p is
+    smooth enough, which makes some slope denominator a multiple of p.
+    unlike pollard's rho the cost depends on the size of the factor found,
+    and every curve is a fresh chance. returns a factor or None.
+    """
+    primes = SMALL_PRIMES if bound <= SMALL_PRIMES[-1] else prime_table(bound + 1).primes(bound + 1)
+    powers = []
+    for p in primes:
+        if p > bound:
+            break
+        pk = p
+        while pk * p <= bound:
+            pk *= p
+        powers.append(pk)
+
+    for _ in range(curves):
+        if instrument.enabled:
+            instrument.count('ecm_curves')
+        x, y, a = random.randrange(n), random.randrange(n), random.randrange(n)
+        b = (y * y - x * x * x - a * x) % n
+        g = gcd((4 * a * a * a + 27 * b * b) % n, n)
+        if g == n:
+            continue
+        if g > 1:
+            return g
+        P = (x, y)
+        try:
+            for pk in powers:
+                P = _ec_mul(pk, P, a, n)
+                if P is None:
+                    break
+        except _NotInvertible as e:
+            if e.divisor < n:
+                return e.divisor
+    return None
+
+
+def find_factor(n, rho_limit=None, curves=50, bound=2000):
+    """
+    factoring engine, returns a non trivial factor of the composite n.
+    tries the small prime table first, then pollard's rho for up to
+    rho_limit steps (by default a few times n ** 0.25, the expected cost
+    for a balanced semiprime), then lenstra's ecm, raising the smoothness
+    bound fourfold every round until a factor turns up.
+    """
+    for p in SMALL_PRIMES:
+        if n % p == 0 and n != p:
+            return p
+    root = math.isqrt(n)
+    if root * root == n:
+        return root
+    rho_limit = rho_limit or max(1 << 16, 4 * math.isqrt(root))
+    g = pollards_rho(n, limit=rho_limit)
+    while not g:
+        g = lenstra_ecm(n, curves, bound)
+        bound *= 4
     return g
 
 
-# def str_to_int(message):
-#     """
-#     """
-#     return int(message.encode().hex(), 16)
+def str_to_int(message):
+    """
+    packs a str, utf-8 encoded, or bytes message into a single integer.
+    a 0x01 marker byte goes in front so leading zero bytes survive the
+    round trip, the result is below 256 ** (len + 1).
+    """
+    if isinstance(message, str):
+        message = message.encode()
+    return int.from_bytes(b'\x01' + bytes(message), byteorder='big')
 
 
-# def int_to_str(message):
-#     return bytearray.fromhex(hex(message)[2:])
\ No newline at end of file
+def int_to_str(message, encoding='utf-8'):
+    """
+    inverse of str_to_int, returns a str, or the raw bytes when encoding
+    is None
+    """
+    data = message.to_bytes((message.bit_length() + 7) // 8, byteorder='big')
+    if data[:1] != b'\x01':
+        raise Exception('Message was not encoded by str_to_int.')
+    return data[1:].decode(encoding) if encoding else data[1:]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+title: instrument.py
+date: 2026-10-18
+author: jskrable
+description: operation counters, phase timings and step tracing for the
+hot paths in crypt_helpers.py and ciphers.py
+"""
+
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+
+# set while any recorder is collecting. instrumented code checks this one
+# flag before doing anything else, so collection costs nothing when off
+enabled = False
+# set while any active recorder also wants step by step trace events
+tracing = False
+_active = []
+
+
+class Recorder:
+    """
+    holds the counters, phase timings and, with trace set, the trace
+    events collected while it is active, see collect
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.counters = {}
+        self.phases = {}
+        self.events = []
+
+
+    def snapshot(self):
+        """
+        everything collected so far as a plain dict, counters by name and
+        phases by name as {'count', 'total', 'mean'} in seconds
+        """
+        return {
+            'counters': dict(self.counters),
+            'phases': {name: {'count': count, 'total': total, 'mean': total / count}
+                       for name, (count, total) in self.phases.items()},
+            'events': list(self.events),
+        }
+
+
+    def to_json(self, **kwargs):
+        import json
+        return json.dumps(self.snapshot(), **kwargs)
+
+
+def _update():
+    global enabled, tracing
+    enabled = bool(_active)
+    tracing = any(r.trace for r in _active)
+
+
+@contextmanager
+def collect(trace=False):
+    """
+    scoped collection, yields a Recorder that receives every count,
+    phase and, with trace set, trace event made inside the block.
+    scopes nest, an outer recorder sees everything an inner one does.
+    """
+    recorder = Recorder(trace)
+    _active.append(recorder)
+    _update()
+    try:
+        yield recorder
+    finally:
+        _active.remove(recorder)
+        _update()
+
+
+def count(name, n=1):
+    """
+    adds n to a counter in every active recorder. callers check enabled
+    first on hot paths.
+    """
+    for r in _active:
+        r.counters[name] = r.counters.get(name, 0) + n
+
+
+def event(name, **fields):
+    """
+    records one trace event, a dict of its fields under 'event', in
+    every tracing recorder
+    """
+    for r in _active:
+        if r.trace:
+            r.events.append(dict(event=name, **fields))
+
+
+@contextmanager
+def phase(name):
+    """
+    times the block as one run of the named phase in every active
+    recorder. a no op when nothing is collecting.
+    """
+    if not enabled:
+        yield
+        return
+    recorders = list(_active)
+    start = timer()
+    try:
+        yield
+    finally:
+        elapsed = timer() - start
+        for r in recorders:
+            c, total = r.phases.get(name, (0, 0.0))
+            r.phases[name] = (c + 1, total + elapsed)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+title: key_pool.py
+date: 2026-10-18
+author: jskrable
+description: stock of pregenerated RSA key pairs and El Gamal domain
+parameters, refilled in the background and optionally kept on disk
+"""
+
+import os
+import json
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import ciphers
+
+
+def _rsa_params(size, safe=False):
+    """
+    a fresh RSA key pair as (p, q, e)
+    """
+    p, q = ciphers._generate_primes(size)
+    return p, q, ciphers._generate_exponent((p - 1) * (q - 1), size)
+
+
+def _elgamal_params(size, safe=False):
+    """
+    fresh El Gamal domain parameters as (mod, base). a key pair on top of
+    them costs a single exponentiation, so only these are pooled.
+    """
+    params = ciphers.DomainParameters(size, safe=safe)
+    return params.mod, params.base
+
+
+class KeyPool:
+    """
+    keeps stock ready keys per size for cipher, ciphers.RSA key pairs or
+    ciphers.ElGamal domain parameters (safe primes with safe set), so
+    issuing one does not wait on prime generation. every key taken is
+    replaced in the background by workers processes.
+
+    with path set, the stock is kept in that json file, loaded at start
+    and rewritten whenever it changes, so a restart does not drain it.
+    the file holds private keys in the clear, so it is written readable
+    by its owner only.
+    """
+
+    def __init__(self, cipher=ciphers.RSA, sizes=(10,), stock=8, workers=1, path=None, safe=False):
+        if cipher not in (ciphers.RSA, ciphers.ElGamal):
+            raise Exception('Only RSA and ElGamal keys can be pooled.')
+        self.cipher = cipher
+        self.stock = stock
+        self.path = path
+        self.safe = safe
+        self._generate = _rsa_params if cipher is ciphers.RSA else _elgamal_params
+        self._keys = {size: deque() for size in sizes}
+        self._pending = {size: 0 for size in sizes}
+        self._ready = threading.Condition()
+        self._saving = threading.Lock()
+        self._closed = False
+        if path:
+            self._load()
+        self._executor = ProcessPoolExecutor(workers)
+        self.refill()
+
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('cipher') != self.cipher.__name__ or saved.get('safe') != self.safe:
+            return
+        for size, keys in saved.get('keys', {}).items():
+            if int(size) in self._keys:
+                self._keys[int(size)].extend(tuple(k) for k in keys)
+
+
+    def save(self):
+        """
+        writes the current stock to path, whole then renamed into place
+        """
+        if not self.path:
+            return
+        # the snapshot is taken under the save lock, so an older one can
+        # never overwrite a newer one
+        with self._saving:
+            with self._ready:
+                saved = {
+                    'cipher': self.cipher.__name__,
+                    'safe': self.safe,
+                    'keys': {str(size): list(keys) for size, keys in self._keys.items()},
+                }
+            tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+            # private keys, readable by the owner only
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            if hasattr(os, 'fchmod'):
+                # a temp file left behind by a crash keeps its old mode
+                os.fchmod(fd, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(saved, f)
+            os.replace(tmp, self.path)
+
+
+    def refill(self):
+        """
+        starts background generation for every size below stock
+        """
+        with self._ready:
+            if self._closed:
+                return
+            for size, keys in self._keys.items():
+                for _ in range(self.stock - len(keys) - self._pending[size]):
+                    self._pending[size] += 1
+                    future = self._executor.submit(self._generate, size, self.safe)
+                    future.add_done_callback(lambda f, size=size: self._done(size, f))
+
+
+    def _done(self, size, future):
+        with self._ready:
+            self._pending[size] -= 1
+            if future.cancelled() or future.exception():
+                return
+            self._keys[size].append(future.result())
+            self._ready.notify_all()
+        self.save()
+
+
+    def available(self, size):
+        """
+        number of keys of size ready to issue
+        """
+        with self._ready:
+            return len(self._keys[size])
+
+
+    def params(self, size=None, timeout=None):
+        """
+        takes the raw parameters of one key of size, the first pooled
+        size by default, (p, q, e) for RSA and (mod, base) for El Gamal.
+        waits up to timeout seconds, forever when None, for the
+        background workers if the stock has run out, then generates one
+        in place.
+        """
+        size = next(iter(self._keys)) if size is None else size
+        with self._ready:
+            if size not in self._keys:
+                raise Exception(f'Size {size} is not pooled.')
+            self._ready.wait_for(lambda: self._keys[size], timeout)
+            key = self._keys[size].popleft() if self._keys[size] else None
+        self.refill()
+        if key is None:
+            return self._generate(size, self.safe)
+        self.save()
+        return key
+
+
+    def get(self, size=None, timeout=None):
+        """
+        issues a cipher instance built on a pooled key, see params
+        """
+        if self.cipher is ciphers.RSA:
+            p, q, e = self.params(size, timeout)
+            return ciphers.RSA(e=e, p=p, q=q)
+        mod, base = self.params(size, timeout)
+        return ciphers.ElGamal(mod=mod, base=base)
+
+
+    def close(self):
+        """
+        stops the background workers, dropping keys not yet generated,
+        and saves the stock
+        """
+        with self._ready:
+            self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.save()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
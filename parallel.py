@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+title: parallel.py
+date: 2026-10-18
+author: jskrable
+description: process pool execution for key generation, bulk cipher
+operations and cracking
+"""
+
+import os
+import math
+import queue
+import random
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+import crypt_helpers as cp
+
+
+def chunked(sequences, size):
+    """
+    splits equal length sequences into consecutive chunks of up to size
+    items. yields a tuple with one slice per sequence.
+    """
+    for start in range(0, len(sequences[0]), size):
+        yield tuple(s[start:start + size] for s in sequences)
+
+
+def _call_chunk(func, chunk):
+    """
+    worker side entry point, applies func to one tuple of slices
+    """
+    return func(*chunk)
+
+
+def _concat(parts):
+    """
+    joins per chunk results back together in order. results that are
+    tuples of lists, like ElGamal's (c1s, c2s), are joined element wise.
+    """
+    if parts and isinstance(parts[0], tuple):
+        return tuple(_concat(list(p)) for p in zip(*parts))
+    return [x for part in parts for x in part]
+
+
+def map_chunks(func, *sequences, workers=None, chunksize=None, executor=None):
+    """
+    runs func over chunks of one or more equal length sequences across a
+    pool of processes and returns the joined results in input order.
+    func receives one slice per sequence and must return a list (or a
+    tuple of lists) with one entry per item, it must also be picklable,
+    so a module level function or a bound method of a picklable object.
+    each chunk is pickled once, so larger chunks amortize the transfer.
+    by default work is split into four chunks per worker. pass an open
+    executor to reuse its processes across calls.
+    """
+    sequences = [list(s) for s in sequences]
+    if not sequences[0]:
+        return _concat([func(*sequences)])
+    workers = workers or os.cpu_count()
+    if not chunksize:
+        chunksize = math.ceil(len(sequences[0]) / (workers * 4))
+    chunks = chunked(sequences, chunksize)
+    if executor:
+        return _concat(list(executor.map(partial(_call_chunk, func), chunks)))
+    with ProcessPoolExecutor(workers) as pool:
+        return _concat(list(pool.map(partial(_call_chunk, func), chunks)))
+
+
+def _construct(cipher, sizes):
+    """
+    worker side key generation, one cipher instance per size
+    """
+    return [cipher(size) for size in sizes]
+
+
+def generate_keys(cipher, count, size=10, workers=None, chunksize=None, executor=None):
+    """
+    generates count instances of a cipher class, each with a freshly made
+    key of the given size, across a pool of processes. returns a list of
+    cipher objects.
+    """
+    return map_chunks(partial(_construct, cipher), [size] * count, workers=workers,
+                      chunksize=chunksize, executor=executor)
+
+
+# shared by the cracking workers, handed over by the pool initializer
+_stop = None
+_points = None
+
+
+def _init_crack_worker(stop, points=None):
+    global _stop, _points
+    _stop = stop
+    _points = points
+    if points is not None:
+        # points left unread once the parent stops listening must not
+        # hold the worker open at exit
+        points.cancel_join_thread()
+
+
+def _run_walkers(worker, args, workers, collect=None):
+    """
+    runs one worker per process with its own random seed, sharing a stop
+    event, and waits for all of them. collect, when given, is called in
+    the parent with every item the workers put on the points queue and
+    sets the stop event by returning something other than None. returns
+    (result, worker results in start order).
+    """
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    shared = ctx.Queue() if collect else None
+    result = None
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_crack_worker,
+                             initargs=(stop, shared)) as pool:
+        futures = [pool.submit(worker, *args, random.getrandbits(64)) for _ in range(workers)]
+        while collect and result is None:
+            done, _ = wait(futures, timeout=0, return_when=FIRST_EXCEPTION)
+            finished = len(done) == len(futures) or any(f.exception() for f in done)
+            try:
+                result = collect(shared.get(timeout=0 if finished else 0.05))
+            except queue.Empty:
+                if finished:
+                    break
+        if collect:
+            stop.set()
+        results = [f.result() for f in futures]
+    return result, results
+
+
+def _factor_worker(n, batch, seed):
+    """
+    independent brent walks with random x and c until one finds a factor
+    or another worker does. returns (factor or None, steps).
+    """
+    rng = random.Random(seed)
+    steps = 0
+    while not _stop.is_set():
+        g, s = cp.brent_walk(n, rng.randint(2, n - 2), rng.randint(1, n - 1), batch, stop=_stop)
+        steps += s
+        if g and g != n:
+            _stop.set()
+            return g, steps
+    return None, steps
+
+
+def parallel_factor(n, workers=None, batch=100):
+    """
+    factors the composite n with workers independent pollard rho walks
+    running in parallel, each in its own process. the first walk to find
+    a factor stops every other one. returns (factor, list of steps walked
+    by each worker).
+    """
+    if cp.miller_rabin(n):
+        raise Exception('n is prime you fool.')
+    for p in cp.SMALL_PRIMES:
+        if n % p == 0:
+            return p, [0]
+    workers = workers or os.cpu_count()
+    _, results = _run_walkers(_factor_worker, (n, batch), workers)
+    return next(g for g, _ in results if g), [steps for _, steps in results]
+
+
+def _log_worker(a, b, mod, q, bits, limit, seed):
+    """
+    random walks for pollard's rho for logarithms, restarted at a fresh
+    random b**u * a**v after every distinguished point, one whose low bits
+    bits are all zero, which is reported on the points queue. returns
+    steps walked.
+    """
+    rng = random.Random(seed)
+    mask = (1 << bits) - 1
+    # walks that stay clear of distinguished points for this long are cycling
+    longest = 20 << bits
+    steps = 0
+    while not _stop.is_set() and steps < limit:
+        u, v = rng.randrange(q), rng.randrange(q)
+        x = (cp.fast_exp(b, u, mod) * cp.fast_exp(a, v, mod)) % mod
+        for _ in range(longest):
+            x, u, v = cp._rho_log_step(x, u, v, a, b, mod, q)
+            steps += 1
+            if not x & mask:
+                _points.put((x, u, v))
+                break
+    return steps
+
+
+def parallel_rho_log(a, b, mod, order, workers=None, bits=None, limit=None):
+    """
+    pollard's rho for logarithms with distinguished points, solves
+    b**x = a mod mod where b has prime order order. every worker process
+    runs random walks over the same step function and reports the
+    distinguished points it lands on, bits low zero bits, about a quarter
+    of the bit length of order by default. two walks that merge reach the
+    same distinguished point, which gives a linear equation for x, so the
+    speedup is close to linear in workers. each worker gives up after
+    limit steps. returns (x or None, list of steps walked by each worker).
+    """
+    q = order
+    workers = workers or os.cpu_count()
+    bits = q.bit_length() // 4 if bits is None else bits
+    limit = limit or 64 * math.isqrt(q) + (1 << 12)
+    a %= mod
+    seen = {}
+
+    def collect(point):
+        x, u, v = point
+        if x not in seen:
+            seen[x] = (u, v)
+            return None
+        U, V = seen[x]
+        # b**u * a**v = b**U * a**V, so u - U = x * (V - v) mod q
+        dv = (V - v) % q
+        if dv == 0:
+            return None
+        log = ((u - U) * cp.mod_inverse(dv, q)) % q
+        return log if cp.fast_exp(b, log, mod) == a else None
+
+    log, steps = _run_walkers(_log_worker, (a, b, mod, q, bits, limit), workers, collect=collect)
+    return log, steps
+
+
+def parallel_discrete_log(a, b, mod, order=None, workers=None, method='auto', memory=None,
+                          min_bits=32):
+    """
+    crypt_helpers.discrete_log with every pollard's rho subproblem of at
+    least min_bits bits solved by parallel_rho_log, smaller ones are over
+    before a pool would start. returns (x or None, list of steps walked by
+    each worker, summed over the subproblems).
+    """
+    workers = workers or os.cpu_count()
+    totals = [0] * workers
+
+    def solver(a, b, mod, q):
+        if q.bit_length() < min_bits:
+            return cp.pollards_rho_log(a, b, mod, q)
+        log, steps = parallel_rho_log(a, b, mod, q, workers)
+        for i, s in enumerate(steps):
+            totals[i] += s
+        return log
+
+    return cp.discrete_log(a, b, mod, order, method, memory, solver), totals
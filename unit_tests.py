@@ -7,11 +7,24 @@ author: jskrable
 description: unit testing for ciphers.py and crypt_helpers.py
 """
 
+import io
+import json
+import os
 import math
+import time
 import random
 import unittest
 import argparse
+import tempfile
+import codec
+import asyncio
 import ciphers
+import async_ciphers
+import instrument
+import batch_gcd
+import benchmarks
+import parallel
+import key_pool
 import crypt_helpers as cp
 
 global SIZE
@@ -20,18 +33,65 @@ global SIZE
 class TestCryptHelpers(unittest.TestCase):
     """
     Unit tests for the functions in crypt_helpers.py.
-
-    TODO:
-    - write for primitive root search
-    - write for extended euclidean
-    - write for efficient prime factors
     """
 
     
+    def test_LazyImports(self):
+        for module, (seconds, heavy) in benchmarks.bench_import(runs=1).items():
+            self.assertEqual([], heavy)
+
+
+    def test_StringEncoding(self):
+        for i in range(SIZE):
+            data = bytes(random.randrange(3)) + os.urandom(random.randint(0, 40))
+            self.assertEqual(data, cp.int_to_str(cp.str_to_int(data), None))
+        self.assertEqual('crypto', cp.int_to_str(cp.str_to_int('crypto')))
+
+
+    def test_Benchmarks(self):
+        report = benchmarks.run_suite(['gcd', 'rsa_encrypt'], [10], runs=2, number=5)
+        self.assertEqual({'gcd', 'rsa_encrypt'}, set(report['results']))
+        stats = report['results']['gcd']['10']
+        self.assertEqual(True, 0 < stats['min'] <= stats['median'] <= stats['max'])
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'baseline.json')
+            benchmarks.save(report, path)
+            baseline = benchmarks.load(path)
+        self.assertEqual(False, any(r for _, _, _, r in benchmarks.compare(report, baseline)))
+        for sizes in baseline['results'].values():
+            for stats in sizes.values():
+                stats['median'] /= 2
+        self.assertEqual(True, all(r for _, _, _, r in benchmarks.compare(report, baseline)))
+        # fixtures come from a local seeded generator, the same every run
+        keys = [benchmarks._rsa(random.Random('rsa'), 8).n for i in range(2)]
+        groups = [benchmarks._elgamal(random.Random('elgamal'), 8, True).mod for i in range(2)]
+        self.assertEqual((keys[0], groups[0]), (keys[1], groups[1]))
+        self.assertEqual(True, cp.miller_rabin(groups[0], safe=True))
+
+
+    def test_Instrumentation(self):
+        with instrument.collect() as outer:
+            with instrument.collect(trace=True) as inner:
+                self.assertEqual(6, cp.gcd(12, 42))
+                self.assertEqual(5, cp.fast_exp(3, 5, 7))
+            cp.miller_rabin(2 ** 61 - 1)
+            ciphers.RSA(5)
+        self.assertEqual(False, instrument.enabled or instrument.tracing)
+        self.assertEqual({'gcd': 1, 'fast_exp': 1, 'modmul': 5}, inner.snapshot()['counters'])
+        steps = [(e['n'], e['q'], e['m'], e['r']) for e in inner.events if e['event'] == 'gcd_step']
+        self.assertEqual([(42, 3, 12, 6), (12, 2, 6, 0)], steps)
+        self.assertEqual(5, inner.events[-1]['y'])
+        snapshot = json.loads(outer.to_json())
+        self.assertEqual(True, snapshot['counters']['mr_rounds'] >= 7)
+        self.assertEqual(1, snapshot['phases']['rsa_primes']['count'])
+        self.assertEqual([], snapshot['events'])
+        # nothing is collected outside a scope
+        cp.gcd(12, 42)
+        self.assertEqual(snapshot['counters'], outer.counters)
+
+
     def test_Euclidean(self):
-        with open('./primes.txt') as f:
-            data = f.read()
-            primes = [int(x) for x in data[1:-1].split(',')]
+        primes = cp.get_primes()
 
         p_len = len(primes)
         for p in primes:
@@ -40,12 +100,99 @@ class TestCryptHelpers(unittest.TestCase):
                     self.assertEqual(1, cp.gcd(p,q))
 
 
-    # def test_PrimeSearch(self):
-    #     for i in range(SIZE):
-    #         # switch = True if random.random() >= 0.5 else False
-    #         order = random.randint(1,3)
-    #         p = cp.prime_search(order, True)
-    #         self.assertEqual(True, cp.miller_rabin(p))
+    def test_ExtendedEuclidean(self):
+        for i in range(SIZE * 10):
+            m = random.randint(0, 10 ** 40)
+            n = random.randint(0, 10 ** 40)
+            div, x, y = cp.ext_gcd(m, n)
+            self.assertEqual(math.gcd(m, n), div)
+            self.assertEqual(div, x * m + y * n)
+
+
+    def test_LehmerGCD(self):
+        for i in range(SIZE):
+            g = random.getrandbits(3000)
+            m = random.getrandbits(9000) * g
+            n = random.getrandbits(9000) * g
+            self.assertEqual(math.gcd(m, n), cp.gcd(m, n))
+
+
+    def test_ModInverse(self):
+        for p in cp.get_primes()[:SIZE * 10]:
+            a = random.randint(1, p - 1)
+            self.assertEqual(1, (a * cp.mod_inverse(a, p)) % p)
+            self.assertEqual(cp.mod_inverse(a, p), cp.cached_inverse(a, p))
+        with self.assertRaises(Exception):
+            cp.mod_inverse(6, 9)
+        # decryption never leaves a secret behind in the cache
+        cp.cached_inverse.cache_clear()
+        g = ciphers.ElGamal()
+        r = ciphers.RSA(7)
+        self.assertEqual(1234, g.decrypt(*g.encrypt(1234)))
+        self.assertEqual(1234, r.decrypt(r.encrypt(1234)))
+        self.assertEqual(0, cp.cached_inverse.cache_info().currsize)
+
+
+    def test_PrimeSearch(self):
+        for i in range(SIZE):
+            # switch = True if random.random() >= 0.5 else False
+            order = random.randint(1,3)
+            p = cp.prime_search(order, True)
+            self.assertEqual(True, cp.miller_rabin(p))
+            self.assertEqual(order, len(str(p)))
+
+
+    def test_SafePrimeSearch(self):
+        for i in range(SIZE):
+            order = random.randint(1, 10)
+            p = cp.prime_search(order, True, safe=True)
+            q = (p - 1) // 2
+            self.assertEqual(True, cp.miller_rabin(p) and cp.miller_rabin(q))
+            self.assertEqual(order, len(str(q)))
+            self.assertEqual(True, cp.miller_rabin(p, safe=True))
+        self.assertEqual(False, cp.miller_rabin(13, safe=True))
+
+
+    def test_PrimitiveRootSearch(self):
+        for p in cp.get_primes()[1:SIZE * 10]:
+            r = cp.primitive_root_search(p)
+            # a generator reaches every element of the group
+            self.assertEqual(p - 1, len({cp.fast_exp(r, e, p) for e in range(p - 1)}))
+            self.assertEqual(False, any(len({cp.fast_exp(s, e, p) for e in range(p - 1)}) == p - 1
+                                        for s in range(2, r)))
+        p = cp.prime_search(6, True, safe=True)
+        r = cp.primitive_root_search(p, {2, (p - 1) // 2})
+        self.assertEqual(r, cp.primitive_root_search(p))
+        self.assertEqual(-1, cp.primitive_root_search(15))
+
+
+    def test_SieveCandidates(self):
+        primes = set(cp.small_primes(10 ** 5))
+        for i in range(SIZE):
+            start = random.randrange(1, 10 ** 5 - 200, 2)
+            survivors = cp.sieve_candidates(start, 100)
+            expected = [c for c in range(start, start + 200, 2) if c in primes]
+            self.assertEqual(expected, [c for c in survivors if c in primes])
+            for c in survivors:
+                self.assertEqual(False, any(c % p == 0 and c != p for p in cp.SMALL_PRIMES))
+
+
+    def test_PrimeTable(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'primes.bin')
+            built = cp.PrimeTable(10 ** 5, path)
+            loaded = cp.PrimeTable(10 ** 4, path)
+            self.assertEqual(10 ** 5, loaded.limit)
+            self.assertEqual(cp.small_primes(10 ** 5), built.primes())
+            self.assertEqual(cp.small_primes(10 ** 4), loaded.primes(10 ** 4))
+            primes = set(built)
+            for n in range(-1, 10 ** 5):
+                self.assertEqual(n in primes, n in loaded)
+            # a table too small for the request is rebuilt
+            self.assertEqual(2 * 10 ** 5, cp.PrimeTable(2 * 10 ** 5, path).limit)
+        for p in cp.get_primes():
+            self.assertEqual(True, p in cp.prime_table())
+            self.assertEqual(True, cp.is_prime(p))
 
 
     def test_FastExponentiation(self):
@@ -59,15 +206,55 @@ class TestCryptHelpers(unittest.TestCase):
             ((x ** Es[i]) % Ms[i])) for i, x in enumerate(Xs)]
 
 
+    def test_FastExponentiationMethods(self):
+
+        for i in range(SIZE):
+            m = random.randint(2, 10 ** 60)
+            x = random.randint(0, 10 ** 80)
+            e = random.randint(1, 10 ** 60)
+            for method in ['auto', 'window', 'montgomery', 'binary']:
+                self.assertEqual(pow(x, e, m), cp.fast_exp(x, e, m, method=method))
+
+
     def test_MillerRabin(self):
-        with open('./primes.txt') as f:
-            data = f.read()
-            primes = [int(x) for x in data[1:-1].split(',')]
+        primes = cp.get_primes()
 
         for i, p in enumerate(primes):
             self.assertEqual(True, cp.miller_rabin(p))
 
 
+    def test_MillerRabinDeterministic(self):
+        primes = cp.prime_table()
+        for n in range(10 ** 5):
+            self.assertEqual(n in primes, cp.miller_rabin(n))
+        # strong pseudoprimes to the smaller witness sets
+        for n in [2047, 1373653, 25326001, 3215031751, 2152302898747,
+                  3474749660383, 341550071728321, 3825123056546413051]:
+            self.assertEqual(False, cp.miller_rabin(n))
+
+
+    def test_BailliePSW(self):
+        for p in cp.get_primes():
+            self.assertEqual(True, cp.baillie_psw(p))
+            self.assertEqual(True, cp.is_prime(p, 'bpsw'))
+        # strong lucas pseudoprimes and a strong pseudoprime to base 2
+        for n in [5459, 5777, 10877, 16109, 18971, 22499, 2047, 3215031751]:
+            self.assertEqual(False, cp.baillie_psw(n))
+        # the lucas half on its own, past the trial division and base 2
+        # round that stop all of the above inside baillie_psw
+        lucas_pseudoprimes = [5459, 5777, 10877, 16109, 18971, 22499]
+        for n in lucas_pseudoprimes:
+            self.assertEqual(True, cp.strong_lucas(n))
+        for n in [2047, 1373653, 25326001, 3215031751, 2152302898747]:
+            self.assertEqual(False, cp.strong_lucas(n))
+        primes = cp.prime_table()
+        for n in range(5, 10 ** 4, 2):
+            if n not in lucas_pseudoprimes:
+                self.assertEqual(n in primes, cp.strong_lucas(n))
+        self.assertEqual(True, cp.baillie_psw(2 ** 521 - 1))
+        self.assertEqual(False, cp.baillie_psw((2 ** 127 - 1) * (2 ** 61 - 1)))
+
+
     def test_BlumBlumShub(self):
         for i in range(SIZE):
             s = random.randint(1,25)
@@ -75,11 +262,38 @@ class TestCryptHelpers(unittest.TestCase):
             self.assertEqual(s,n)
 
 
-    # def test_NaorReingold(self):
-    #     for i in range(SIZE):
-    #         s = random.randint(1,25)
-    #         n = len(str(cp.naor_reingold(s)))
-    #         self.assertEqual(s,n)
+    def test_BlumBlumShubGenerator(self):
+        g = cp.BlumBlumShub(order=4)
+        for i in range(SIZE):
+            k = random.randint(1, 10 ** 12)
+            self.assertEqual(True, 0 <= g.randbelow(k) < k)
+            self.assertEqual(True, g.getrandbits(13) < 2 ** 13)
+            self.assertEqual(i, len(g.randbytes(i)))
+        # the same primes and seed replay the same stream
+        a = cp.BlumBlumShub(p=1019, q=1031, seed=77)
+        b = cp.BlumBlumShub(p=1019, q=1031, seed=77)
+        self.assertEqual(a.randbytes(64), b.randbytes(64))
+
+
+    def test_NaorReingold(self):
+        for i in range(SIZE):
+            s = random.randint(1,25)
+            n = len(str(cp.naor_reingold(s)))
+            self.assertEqual(s,n)
+
+
+    def test_NaorReingoldGenerator(self):
+        g = cp.NaorReingold(n=20)
+        xs = [random.randint(0, 2 ** 20 - 1) for i in range(SIZE * 10)]
+        self.assertEqual([g.evaluate(x) for x in xs], list(g.evaluate_many(xs)))
+        self.assertEqual(SIZE, len(g.randbytes(SIZE)))
+        self.assertEqual(16, len(next(g.stream(16))))
+        # the exponent is a product, so outputs on inputs differing in
+        # separate bits are not related multiplicatively
+        y, N = g._group_element, g.N
+        for i in range(SIZE):
+            u, v = random.sample([1 << b for b in range(20)], 2)
+            self.assertNotEqual(y(0) * y(u | v) % N, y(u) * y(v) % N)
 
 
 class TestBreakers(unittest.TestCase):
@@ -95,6 +309,39 @@ class TestBreakers(unittest.TestCase):
             self.assertEqual(a, answer)
 
 
+    def test_BabyStepGiantStepMemoryBudget(self):
+        for i in range(SIZE):
+            m = cp.prime_search(5, True)
+            b = cp.primitive_root_search(m)
+            a = random.randint(1, m - 1)
+            # a table of 64 entries, far below sqrt(m)
+            result = cp.baby_step_giant_step(a, b, m, memory=64 * 24)
+            self.assertEqual(a, cp.fast_exp(b, result, m))
+        # 4 only generates {1, 2, 4} mod 7
+        self.assertEqual(None, cp.baby_step_giant_step(3, 4, 7))
+
+
+    def test_PollardsRhoLog(self):
+        for i in range(SIZE):
+            m = cp.prime_search(5, True)
+            b = cp.primitive_root_search(m)
+            a = random.randint(1, m - 1)
+            for method in ['auto', 'rho', 'bsgs']:
+                result = cp.discrete_log(a, b, m, method=method)
+                self.assertEqual(a, cp.fast_exp(b, result, m))
+
+
+    def test_PohligHellman(self):
+        # p - 1 = 2 * 3 * 5 * 7 * 11 * 13 * 17**2 * 29 * 43, smooth
+        p = 2 * 3 * 5 * 7 * 11 * 13 * 17 ** 2 * 29 * 43 + 1
+        self.assertEqual(True, cp.miller_rabin(p))
+        for i in range(SIZE):
+            x = random.randint(0, p - 2)
+            a = cp.fast_exp(7, x, p)
+            result = cp.pohlig_hellman(a, 7, p, cp.factorize(p - 1))
+            self.assertEqual(a, cp.fast_exp(7, result, p))
+
+
     def test_PollardsRho(self):
         for i in range(SIZE):
             p = cp.prime_search(5, True)
@@ -104,6 +351,94 @@ class TestBreakers(unittest.TestCase):
             self.assertEqual(True, factor in [p,q])            
 
 
+    def test_LenstraECM(self):
+        for i in range(SIZE):
+            p = cp.prime_search(6, True)
+            q = cp.prime_search(25, True)
+            factor = None
+            while not factor:
+                factor = cp.lenstra_ecm(p * q, curves=20, bound=1000)
+            self.assertEqual(True, factor in [p, q])
+
+
+    def test_FindFactor(self):
+        for i in range(SIZE * 10):
+            n = random.randint(4, 10 ** 12)
+            if cp.miller_rabin(n):
+                continue
+            factor = cp.find_factor(n)
+            self.assertEqual(0, n % factor)
+            self.assertEqual(True, 1 < factor < n)
+
+
+    def test_Factorize(self):
+        for i in range(SIZE * 10):
+            n = random.randint(2, 10 ** 15)
+            factors = cp.factorize(n)
+            self.assertEqual(n, math.prod(p ** e for p, e in factors.items()))
+            self.assertEqual(True, all(cp.miller_rabin(p) for p in factors))
+            self.assertEqual(set(factors), cp.eff_prime_factors(n))
+        for i in range(SIZE):
+            p = cp.prime_search(20, True)
+            factors = cp.factorize(p - 1)
+            self.assertEqual(p - 1, math.prod(q ** e for q, e in factors.items()))
+        self.assertEqual({}, cp.factorize(1))
+
+
+    def test_Phi(self):
+        for i in range(SIZE * 10):
+            n = random.randint(1, 2000)
+            coprime = [x for x in range(1, n + 1) if math.gcd(x, n) == 1]
+            self.assertEqual(len(coprime), cp.phi(n))
+            # the smallest exponent taking every unit to 1
+            exponent = next(m for m in range(1, n + 1)
+                            if all(pow(x, m, n) == 1 % n for x in coprime))
+            self.assertEqual(exponent, cp.carmichael(n))
+        p, q = cp.prime_search(12, True), cp.prime_search(12, True)
+        if p != q:
+            self.assertEqual((p - 1) * (q - 1), cp.phi(p * q))
+            self.assertEqual(0, (p - 1) * (q - 1) % cp.carmichael(p * q))
+
+
+    def test_BatchGCD(self):
+        primes = cp.get_primes()
+        random.shuffle(primes)
+        moduli = [primes[2 * i] * primes[2 * i + 1] for i in range(SIZE * 10)]
+        # two new moduli, each sharing a prime with an existing one
+        moduli.append(primes[0] * primes[-1])
+        moduli.append(primes[3] * primes[-2])
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('# moduli\n' + '\n'.join(hex(n) for n in moduli) + '\n')
+            f.flush()
+            for chunk in [None, 3]:
+                weak = batch_gcd.scan(f.name, chunk)
+                self.assertEqual({moduli[0], moduli[1], moduli[-2], moduli[-1]}, set(weak))
+                for n, p in weak.items():
+                    self.assertEqual(0, n % p)
+                    self.assertEqual(True, 1 < p < n)
+        # a re-iterable source is read twice, chunk by chunk, a one shot
+        # generator is taken whole
+        passes = []
+        class Source:
+            def __iter__(self):
+                passes.append(1)
+                return iter(moduli)
+        self.assertEqual(batch_gcd.batch_gcd(moduli), batch_gcd.batch_gcd(Source(), 3))
+        self.assertEqual(2, len(passes))
+        self.assertEqual(set(weak), set(batch_gcd.weak_moduli((n for n in moduli), 3)))
+        self.assertEqual([], batch_gcd.batch_gcd([], 3))
+        # recovered factors feed straight into the RSA decryption path
+        p, q, s = primes[-3], primes[-4], primes[-5]
+        e = 65537
+        while cp.gcd(e, (p - 1) * (q - 1)) != 1:
+            e += 2
+        r = ciphers.RSA(7)
+        message = cp.blum_blum_shub(6)
+        factor = batch_gcd.weak_moduli([p * q, p * s])[p * q]
+        cracked = r.crack(r.encrypt(message, p * q, e), p * q, e, p=factor)
+        self.assertEqual(message, cracked)
+
+
 class TestCiphers(unittest.TestCase):
 
 
@@ -113,6 +448,27 @@ class TestCiphers(unittest.TestCase):
             message = cp.blum_blum_shub(6)
             self.assertEqual(message, r.decrypt(r.encrypt(message)))
             self.assertEqual(message, r.crack(r.encrypt(message)))
+        # an encrypt only instance under an external key
+        for i in range(SIZE * 5):
+            r = ciphers.RSA(7, n=1234567, e=3)
+            self.assertEqual(pow(1000, 3, 1234567), r.encrypt(1000))
+            with self.assertRaises(Exception):
+                r.decrypt(r.encrypt(1000))
+
+
+    def test_RSALargeKey(self):
+        r = ciphers.RSA(40)
+        for i in range(SIZE):
+            message = random.randint(2, r.n - 1)
+            self.assertEqual(message, r.decrypt(r.encrypt(message)))
+
+
+    def test_RSABatch(self):
+        r = ciphers.RSA(7)
+        messages = [cp.blum_blum_shub(6) for i in range(SIZE)]
+        encrypted = r.encrypt_many(messages)
+        self.assertEqual([r.encrypt(m) for m in messages], encrypted)
+        self.assertEqual(messages, r.decrypt_many(encrypted))
 
 
     def test_ElGamal(self):
@@ -126,6 +482,228 @@ class TestCiphers(unittest.TestCase):
             self.assertEqual(message, cracked)
 
 
+    def test_ElGamalCrackNoLog(self):
+        g = ciphers.ElGamal()
+        c1, c2 = g.encrypt(1234)
+        # mod - 1 is no power of 1
+        with self.assertRaisesRegex(Exception, 'Discrete log not found'):
+            g.crack(c1, c2, key=g.mod - 1, base=1)
+
+
+    def test_ElGamalSafePrime(self):
+        g = ciphers.ElGamal(30, safe=True)
+        self.assertEqual(True, cp.miller_rabin(g.mod, safe=True))
+        q = (g.mod - 1) // 2
+        self.assertEqual(False, cp.fast_exp(g.base, 2, g.mod) == 1 or cp.fast_exp(g.base, q, g.mod) == 1)
+        message = cp.blum_blum_shub(20)
+        self.assertEqual(message, g.decrypt(*g.encrypt(message)))
+
+
+    def test_ElGamalPrecompute(self):
+        params = ciphers.DomainParameters(20, safe=True)
+        alice, bob = params.key(), ciphers.ElGamal(params=params)
+        self.assertEqual((alice.mod, alice.base), (bob.mod, bob.base))
+        self.assertEqual((params.mod, params.base), (alice.params.mod, alice.params.base))
+        self.assertEqual(SIZE, bob.precompute(SIZE, key=alice.key_pub))
+        self.assertEqual(0, bob.precomputed())
+        messages = [cp.blum_blum_shub(6) for i in range(SIZE + 2)]
+        encrypted = [bob.encrypt(m, key=alice.key_pub) for m in messages]
+        self.assertEqual(0, bob.precomputed(key=alice.key_pub))
+        self.assertEqual(messages, [alice.decrypt(c1, c2) for c1, c2 in encrypted])
+        # every precomputed ephemeral key is fresh
+        self.assertEqual(len(encrypted), len({c1 for c1, _ in encrypted}))
+
+
+    def test_ElGamalBatch(self):
+        g = ciphers.ElGamal()
+        messages = [cp.blum_blum_shub(6) for i in range(SIZE)]
+        c1s, c2s = g.encrypt_many(messages)
+        self.assertEqual(messages, [g.decrypt(c1, c2) for c1, c2 in zip(c1s, c2s)])
+        self.assertEqual(messages, g.decrypt_many(c1s, c2s))
+
+
+    def test_StreamCodec(self):
+        data = bytes(3) + os.urandom(SIZE * 100)
+        rsa = ciphers.RSA(20)
+        elgamal = ciphers.ElGamal(20)
+        for cipher in [rsa, elgamal]:
+            encrypted = codec.encrypt_stream(cipher, io.BytesIO(data), batch=16)
+            self.assertEqual(data, b''.join(codec.decrypt_stream(cipher, encrypted, batch=7)))
+        # a generator of uneven pieces, and a str
+        pieces = (data[i:i + 5] for i in range(0, len(data), 5))
+        blocks = list(codec.encrypt_stream(rsa, pieces))
+        self.assertEqual(True, all(c < rsa.n for c in blocks))
+        self.assertEqual(data, b''.join(codec.decrypt_stream(rsa, blocks)))
+        self.assertEqual('hello', rsa.decrypt(rsa.encrypt('hello'), decode=True))
+        self.assertEqual('hello', elgamal.decrypt(*elgamal.encrypt('hello'), decode=True))
+
+
+class TestParallel(unittest.TestCase):
+
+
+    def test_MapChunks(self):
+        items = list(range(SIZE * 10))
+        self.assertEqual(
+            [x * x for x in items],
+            parallel.map_chunks(_squares, items, workers=2, chunksize=3))
+
+
+    def test_GenerateKeys(self):
+        keys = parallel.generate_keys(ciphers.RSA, SIZE, 7, workers=2)
+        self.assertEqual(SIZE, len(keys))
+        for r in keys:
+            message = cp.blum_blum_shub(6)
+            self.assertEqual(message, r.decrypt(r.encrypt(message)))
+
+
+    def test_ParallelBatch(self):
+        r = ciphers.RSA(7)
+        messages = [cp.blum_blum_shub(6) for i in range(SIZE * 5)]
+        encrypted = r.encrypt_many(messages, workers=2)
+        self.assertEqual(r.encrypt_many(messages), encrypted)
+        self.assertEqual(messages, r.decrypt_many(encrypted, workers=2, chunksize=2))
+        g = ciphers.ElGamal()
+        c1s, c2s = g.encrypt_many(messages, workers=2)
+        self.assertEqual(messages, g.decrypt_many(c1s, c2s, workers=2))
+
+
+    def test_ParallelFactor(self):
+        for i in range(SIZE):
+            p = cp.prime_search(6, True)
+            q = cp.prime_search(6, True)
+            factor, steps = parallel.parallel_factor(p * q, workers=2)
+            self.assertEqual(True, factor in [p, q])
+            self.assertEqual(True, len(steps) in [1, 2])
+
+
+    def test_ParallelRhoLog(self):
+        # p - 1 = 2 * q with q prime, 4 generates the subgroup of order q
+        p, q = 2000000579, 1000000289
+        self.assertEqual(True, cp.miller_rabin(p) and cp.miller_rabin(q))
+        for i in range(SIZE):
+            x = random.randint(0, q - 1)
+            log, steps = parallel.parallel_rho_log(cp.fast_exp(4, x, p), 4, p, q, workers=2)
+            self.assertEqual(x, log)
+            self.assertEqual(2, len(steps))
+
+
+    def test_ParallelCrack(self):
+        r = ciphers.RSA(7)
+        message = cp.blum_blum_shub(6)
+        self.assertEqual(message, r.crack(r.encrypt(message), workers=2))
+        g = ciphers.ElGamal()
+        c1, c2 = g.encrypt(message)
+        self.assertEqual(message, g.crack(c1, c2, method='rho', workers=2))
+
+
+    def test_AsyncCiphers(self):
+        async def run():
+            pool = async_ciphers.AsyncPool(limit=2)
+            try:
+                rsa = await async_ciphers.AsyncRSA.create(7, pool=pool)
+                elgamal = await async_ciphers.AsyncElGamal.create(pool=pool)
+                messages = [cp.blum_blum_shub(6) for i in range(SIZE)]
+                for message in messages:
+                    c = await rsa.encrypt_async(message)
+                    self.assertEqual(message, await rsa.decrypt_async(c))
+                    self.assertEqual(message, await rsa.crack_async(c))
+                    c1, c2 = await elgamal.encrypt_async(message)
+                    self.assertEqual(message, await elgamal.decrypt_async(c1, c2))
+                keys, ciphertexts = await elgamal.encrypt_many_async(messages)
+                self.assertEqual(messages, await elgamal.decrypt_many_async(keys, ciphertexts))
+                # precomputed ephemeral keys never travel to the workers
+                elgamal.precompute(SIZE)
+                encrypted = [await elgamal.encrypt_async(m) for m in messages]
+                self.assertEqual(len(encrypted), len({c1 for c1, _ in encrypted}))
+                self.assertEqual(messages, [await elgamal.decrypt_async(c1, c2) for c1, c2 in encrypted])
+                # a crack that cannot finish in time is killed
+                big = ciphers.RSA(30)
+                with self.assertRaises(asyncio.TimeoutError):
+                    await async_ciphers.crack_async(big, big.encrypt(5), timeout=0.2, pool=pool)
+                # along with the walker processes of a parallel crack
+                groups = _process_groups()
+                with self.assertRaises(asyncio.TimeoutError):
+                    await async_ciphers.crack_async(big, big.encrypt(5), timeout=1.0, pool=pool, workers=2)
+                deadline = time.time() + 10
+                while _process_groups() - groups and time.time() < deadline:
+                    await asyncio.sleep(0.05)
+                self.assertEqual(set(), _process_groups() - groups)
+                with self.assertRaises(Exception):
+                    await rsa.crack_async(5, n=cp.prime_search(7))
+            finally:
+                pool.close()
+
+        asyncio.run(run())
+
+
+    def test_AsyncPoolLoops(self):
+        # one pool, and the default pool, serve any number of event loops
+        pool = async_ciphers.AsyncPool(limit=1)
+        async def run(pool):
+            return await asyncio.gather(*(pool.run(cp.gcd, 12 * i, 18) for i in range(1, 4)))
+        try:
+            for i in range(2):
+                self.assertEqual([6, 6, 18], asyncio.run(run(pool)))
+                self.assertEqual([6, 6, 18], asyncio.run(run(async_ciphers.default_pool())))
+        finally:
+            pool.close()
+
+
+    def test_KeyPool(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'pool.json')
+            with key_pool.KeyPool(ciphers.RSA, sizes=(7, 8), stock=3, workers=2, path=path) as pool:
+                for i in range(SIZE):
+                    rsa = pool.get(7, timeout=30)
+                    message = cp.blum_blum_shub(6)
+                    self.assertEqual(message, rsa.decrypt(rsa.encrypt(message)))
+                    self.assertEqual(True, 10 ** 12 <= rsa.n < 10 ** 14)
+                p, q, e = pool.params(8)
+                self.assertEqual((8, 8), (len(str(p)), len(str(q))))
+                self.assertEqual(1, cp.gcd(e, (p - 1) * (q - 1)))
+                while pool.available(7) + pool.available(8) < 6:
+                    time.sleep(0.01)
+            # only the owner can read the private keys
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            # the stock survives a restart
+            with key_pool.KeyPool(ciphers.RSA, sizes=(7, 8), stock=3, workers=1, path=path) as pool:
+                self.assertEqual((3, 3), (pool.available(7), pool.available(8)))
+            with key_pool.KeyPool(ciphers.ElGamal, sizes=(12,), stock=2, safe=True) as pool:
+                elgamal = pool.get(timeout=30)
+                self.assertEqual(True, cp.miller_rabin(elgamal.mod, safe=True))
+                self.assertEqual(1234, elgamal.decrypt(*elgamal.encrypt(1234)))
+
+
+    def test_ParallelPrecompute(self):
+        g = ciphers.ElGamal()
+        self.assertEqual(SIZE * 4, g.precompute(SIZE * 4, workers=2))
+        messages = [cp.blum_blum_shub(6) for i in range(SIZE * 4)]
+        encrypted = [g.encrypt(m) for m in messages]
+        self.assertEqual(0, g.precomputed())
+        self.assertEqual(messages, [g.decrypt(c1, c2) for c1, c2 in encrypted])
+        self.assertEqual(len(encrypted), len({c1 for c1, _ in encrypted}))
+
+
+def _squares(chunk):
+    return [x * x for x in chunk]
+
+
+def _process_groups():
+    """
+    process groups with a live member in this session, from /proc
+    """
+    groups = set()
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if fields[0] != 'Z' and int(fields[3]) == os.getsid(0):
+            groups.add(int(fields[2]))
+    return groups
+
+
 def arg_parser():
     """
     function to parse arguments sent to terminal. descriptions below.
@@ -143,6 +721,8 @@ def arg_parser():
                         help='runs just the cipher suite, including RSA and ElGamal, default False')
     parser.add_argument('-u', '--utilities', default=False, type=bool, nargs='?',
                         help='runs just the cryptographic helper function suite, default False')
+    parser.add_argument('-p', '--parallel', default=False, type=bool, nargs='?',
+                        help='runs just the process pool suite, default False')
     args = parser.parse_args()
     return args
 
@@ -161,11 +741,15 @@ if __name__ == '__main__':
     elif args.utilities:
         tests = unittest.TestLoader().loadTestsFromTestCase(TestCryptHelpers)
         print('\nCryptographic utility function tests selected')
+    elif args.parallel:
+        tests = unittest.TestLoader().loadTestsFromTestCase(TestParallel)
+        print('\nProcess pool tests selected')
     else:
         ch_suite = unittest.TestLoader().loadTestsFromTestCase(TestCryptHelpers)
         c_suite = unittest.TestLoader().loadTestsFromTestCase(TestCiphers)
         b_suite = unittest.TestLoader().loadTestsFromTestCase(TestBreakers)
-        tests = unittest.TestSuite([ch_suite, c_suite, b_suite])
+        p_suite = unittest.TestLoader().loadTestsFromTestCase(TestParallel)
+        tests = unittest.TestSuite([ch_suite, c_suite, b_suite, p_suite])
         print('\nAll test suites selected')
 
     print('Starting unit tests...')